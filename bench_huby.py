@@ -0,0 +1,188 @@
+"""
+Benchmarks do huby.py sem WhatsApp nem interface: carga do CSV, pesquisa e
+ordenação, renderização dos templates, custo de cada envio (contra o
+mock_wppconnect.py) e gravação dos comentários, em listas de 1k/10k/100k contatos.
+
+    python bench_huby.py                          # 1000, 10000 e 100000 contatos
+    python bench_huby.py --sizes 1000,10000 --save base.json
+    python bench_huby.py --compare base.json      # mostra a variação em relação à base
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import random
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+import huby
+from mock_wppconnect import MockWPPConnect
+
+NAMES = ["Maria", "José", "Ana", "João", "Antônio", "Francisca", "Carlos", "Paulo", "Dr. Pedro", "Lúcia",
+         "Marcos", "Luiz", "Gabriel", "Rafael", "Juliana", "Márcia", "Fernanda", "Patrícia", "Aline", "Sandra"]
+SURNAMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes"]
+STATUSES = ["", "", "", "", "Não atendeu", "Sem interesse", "Caixa postal", "Não existe"]
+TEMPLATE = "{Olá|Oi|Bom dia} [nome], tudo bem? Seu plano [plano] {vence em breve|está disponível}. 😀"
+
+# ===================================================================
+# UTILITÁRIOS
+# ===================================================================
+def timed(fn, *args, repeat=1):
+    """Menor tempo (s) de `repeat` execuções e o resultado da última."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def make_csv(path, size, seed=42):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Nome", "Obs", "Telefone", "Status", "Plano"])
+        for i in range(size):
+            phone = f"{rng.choice(['11', '21', '31', '41', '51'])}9{rng.randrange(10**8):08d}"
+            writer.writerow([f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}", "", phone, rng.choice(STATUSES),
+                             rng.choice(["Ouro", "Prata", "Bronze"])])
+
+def load_contacts(path):
+    """Lê a lista como o App: ContactListLoader + Contact + PhoneNormalizer."""
+    results, normalizer = queue.Queue(), huby.PhoneNormalizer()
+    loader = huby.ContactListLoader(path, results, lambda n, row: normalizer.apply(huby.App._build_contact(None, n, row)))
+    loader.run()
+    contacts = []
+    while not results.empty():
+        kind, _, payload, _ = results.get_nowait()
+        if kind == "chunk": contacts.extend(payload[0])
+        elif kind == "error": raise RuntimeError(payload)
+    return contacts, loader.header
+
+# ===================================================================
+# BENCHMARKS POR TAMANHO DE LISTA
+# ===================================================================
+def bench_list(size, workdir):
+    path = os.path.join(workdir, f"lista_{size}.csv")
+    make_csv(path, size)
+    r = {}
+    r["carga_csv_s"], (contacts, header) = timed(load_contacts, path)
+
+    store = huby.ContactStore()
+    search, sort = huby.ContactSearchIndex(store), huby.ContactSortIndex(store)
+    r["indexacao_s"], _ = timed(store.load, contacts)
+    # Na carga pelo App os trigramas são calculados na thread de carga; na interface só fica o merge.
+    prepared = huby.ContactSearchIndex.prepare(contacts[:huby.ContactListLoader.CHUNK_SIZE])
+    r["indexacao_lote_tk_ms"] = timed(lambda: huby.ContactSearchIndex(huby.ContactStore()).merge(prepared), repeat=5)[0] * 1000
+    def cold_search(term):
+        search._last = None # sem aproveitar a busca anterior
+        return search.search(term)
+    def typing(term):
+        search._last = None
+        for i in range(2, len(term) + 1): search.search(term[:i])
+    r["pesquisa_nome_ms"] = timed(cold_search, "silva", repeat=5)[0] * 1000
+    r["pesquisa_digitando_ms"] = timed(typing, "oliveira", repeat=5)[0] * 1000 / (len("oliveira") - 1)
+    r["pesquisa_telefone_ms"] = timed(cold_search, "98765", repeat=5)[0] * 1000
+    r["pesquisa_status_ms"] = timed(cold_search, "status:sem", repeat=5)[0] * 1000
+    r["ordenacao_fria_ms"] = timed(lambda: (sort._orders.clear(), sort._ranks.clear(), sort.sort("nome")))[0] * 1000
+    r["ordenacao_cache_ms"] = timed(lambda: sort.sort("nome"), repeat=5)[0] * 1000
+    r["ordenacao_filtro_ms"] = timed(lambda: sort.sort("telefone", list(range(1, size + 1, 3))), repeat=3)[0] * 1000
+
+    app = SimpleNamespace(list_columns={huby.MessageTemplate.field_key(h): i for i, h in enumerate(header) if h.strip()},
+                          _processar_nome=lambda nome: huby.App._processar_nome(None, nome))
+    values_for = lambda contact, fields: huby.App._template_values(app, contact, fields)
+    templates = [huby.MessageTemplate(TEMPLATE, "bench.txt")]
+    elapsed, _ = timed(huby.MessageTemplate.render_batch, templates, contacts, values_for)
+    r["render_por_contato_us"] = elapsed / size * 1e6
+
+    r.update(bench_comments(contacts, workdir))
+    return r
+
+def bench_comments(contacts, workdir):
+    """Custo de uma observação nova com `len(contacts)` já gravadas: JSON (write-behind) e SQLite."""
+    r = {}
+    json_path = os.path.join(workdir, f"comentarios_{len(contacts)}.json")
+    store = huby.CommentStore(json_path)
+    store.FLUSH_THRESHOLD = float("inf")
+    for contact in contacts: store._data[contact.phone_key] = "01 de janeiro, 10:00 de 2025 - Campanha enviada"
+    store._dirty.add(contacts[0].phone_key)
+    r["comentarios_flush_json_ms"] = timed(store.flush)[0] * 1000
+    sample = contacts[:min(len(contacts), 1000)]
+    elapsed, _ = timed(lambda: [store.append_line(c.phone_key, "Não atendeu") for c in sample])
+    r["comentario_json_us"] = elapsed / len(sample) * 1e6
+    if store._timer: store._timer.cancel(); store._timer = None
+
+    database = huby.HubyDatabase(os.path.join(workdir, f"huby_{len(contacts)}.db"))
+    sqlite_store = huby.SQLiteCommentStore(database, json_path)
+    sqlite_store.load()
+    elapsed, _ = timed(lambda: [sqlite_store.append_line(c.phone_key, "Não atendeu") for c in sample])
+    r["comentario_sqlite_us"] = elapsed / len(sample) * 1e6
+    database.close()
+    return r
+
+# ===================================================================
+# CUSTO POR ENVIO CONTRA O SERVIDOR SIMULADO
+# ===================================================================
+def bench_send(sends, latency):
+    r = {}
+    backends = [("requests", huby.WhatsAppConnector)]
+    if huby.aiohttp: backends.append(("async", huby.AsyncWhatsAppConnector))
+    with MockWPPConnect(latency=latency) as mock:
+        for name, connector_class in backends:
+            connector = connector_class("bench")
+            connector.base_url = mock.url
+            connector.generate_token()
+            phones = [f"11987{i:06d}" for i in range(sends)]
+            elapsed, _ = timed(lambda: [connector.send_message(p, "Mensagem de teste") for p in phones])
+            r[f"envio_{name}_ms"] = elapsed / sends * 1000
+            elapsed, _ = timed(lambda: connector.get_messages_for_contact(phones[0], limit=20), repeat=5)
+            r[f"historico_{name}_ms"] = elapsed * 1000
+            connector.close()
+    if huby.aiohttp: huby.AsyncWhatsAppConnector.shutdown()
+    return r
+
+# ===================================================================
+# RELATÓRIO
+# ===================================================================
+def report(results, baseline=None):
+    for section, values in results.items():
+        print(f"\n== {section}")
+        base = (baseline or {}).get(section, {})
+        for key, value in values.items():
+            line = f"  {key:<28} {value:>12.3f}"
+            if isinstance(base.get(key), (int, float)) and base[key]:
+                change = (value - base[key]) / base[key] * 100
+                line += f"   {change:+6.1f}%" + ("  <-- mais lento" if change > 20 else "")
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do Huby (sem WhatsApp nem interface).")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="tamanhos das listas, separados por vírgula")
+    parser.add_argument("--sends", type=int, default=200, help="envios medidos por backend")
+    parser.add_argument("--latency", type=float, default=0.0, help="latência do servidor simulado (s)")
+    parser.add_argument("--save", help="grava os resultados em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="huby_bench_")
+    try:
+        results = {}
+        for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+            print(f"Medindo lista de {size} contatos...")
+            results[f"lista_{size}"] = bench_list(size, workdir)
+        print("Medindo envios contra o servidor simulado...")
+        results["envio"] = bench_send(args.sends, args.latency)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f: baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f: json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,31 @@
 import tkinter as tk
 from tkinter import ttk, font, filedialog, messagebox, simpledialog
 from types import SimpleNamespace
+import argparse
 import csv
 import json
 import os
 import random
+import re
+import shutil
+import sys
+import sqlite3
 from datetime import datetime
 import locale
+import unicodedata
+import zlib
+import heapq
+from collections import OrderedDict, deque
 import requests
+from requests.adapters import HTTPAdapter
+import asyncio
 import threading
+import queue
+import time
+try:
+    import aiohttp # opcional: só o conector assíncrono (http_backend = "async") precisa
+except ImportError:
+    aiohttp = None
 
 # ===================================================================
 # CLASSE HELPER PARA TOOLTIPS
@@ -64,18 +81,76 @@ class Tooltip:
 # ===================================================================
 # CLASSE PARA INTEGRAÇÃO COM WPPCONNECT
 # ===================================================================
+class SendFailure(str):
+    """
+    Mensagem de falha de envio (continua sendo uma str) com a classificação em `kind`:
+    transitória (vale tentar de novo), permanente ou número inválido.
+    """
+    TRANSIENT = "transient"
+    PERMANENT = "permanent"
+    INVALID_NUMBER = "invalid_number"
+    INVALID_NUMBER_SIGNALS = ("not exist", "não existe", "nao existe", "not registered", "invalid number",
+                              "número inválido", "numero invalido", "invalid wid", "no lid for user")
+
+    def __new__(cls, message, kind):
+        failure = super().__new__(cls, message)
+        failure.kind = kind
+        return failure
+
+    @classmethod
+    def from_response(cls, status_code, error_msg):
+        """Classifica uma resposta de erro do wppconnect pelo texto e pelo status HTTP."""
+        message = f"Erro ao enviar ({status_code}): {error_msg}"
+        if any(signal in str(error_msg).lower() for signal in cls.INVALID_NUMBER_SIGNALS):
+            return cls(message, cls.INVALID_NUMBER)
+        if status_code in (408, 409, 425, 429) or status_code >= 500:
+            return cls(message, cls.TRANSIENT)
+        return cls(message, cls.PERMANENT)
+
 class WhatsAppConnector:
-    def __init__(self, session_name):
+    # Timeouts (conexão, leitura) em segundos por endpoint do wppconnect.
+    DEFAULT_TIMEOUTS = {
+        "generate-token": (5, 15),
+        "start-session": (5, 60),
+        "check-connection-session": (3, 10),
+        "close-session": (5, 30),
+        "logout-session": (5, 30),
+        "send-message": (5, 30),
+        "all-messages-in-chat": (5, 30),
+        "get-messages": (5, 15),
+        "check-number-status": (5, 15),
+    }
+    DEFAULT_POOL_SIZE = 4
+
+    def __init__(self, session_name, pool_size=DEFAULT_POOL_SIZE, timeouts=None):
         self.base_url = "http://localhost:21465"
         self.session_name = session_name
         self.secret_key = "THISISMYSECURETOKEN"
         self.is_connected = False
+        self.server_reachable = True # False quando a última verificação não alcançou o wppconnect
         self.token = None
+        self.timeouts = {**self.DEFAULT_TIMEOUTS, **{k: tuple(v) for k, v in (timeouts or {}).items()}}
+
+        # Sessão HTTP própria do perfil: mantém as conexões vivas (keep-alive)
+        # e reaproveita o pool em vez de abrir um socket novo a cada chamada.
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(pool_size)), max_retries=0)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+    def _request(self, method, endpoint, path=None, **kwargs):
+        """Executa uma requisição pelo pool do perfil com o timeout do endpoint."""
+        url = f"{self.base_url}/api/{self.session_name}/{path or endpoint}"
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, (5, 30)))
+        return self.http.request(method, url, **kwargs)
+
+    def close(self):
+        """Libera as conexões mantidas pelo pool do perfil."""
+        self.http.close()
 
     def generate_token(self):
         try:
-            url = f"{self.base_url}/api/{self.session_name}/{self.secret_key}/generate-token"
-            response = requests.post(url)
+            response = self._request("POST", "generate-token", path=f"{self.secret_key}/generate-token")
             if response.status_code in [200, 201]:
                 data = response.json()
                 if 'token' in data:
@@ -85,6 +160,8 @@ class WhatsAppConnector:
                     return False, "Token não encontrado na resposta"
             else:
                 return False, f"Erro ao gerar token: {response.status_code} - {response.text}"
+        except requests.exceptions.Timeout:
+            return False, "Erro: Tempo limite excedido ao gerar token."
         except Exception as e:
             return False, f"Erro inesperado: {str(e)}"
 
@@ -100,7 +177,7 @@ class WhatsAppConnector:
                 if not success:
                     return False, f"Erro ao gerar token: {message}"
             headers = self._get_headers()
-            response = requests.post(f"{self.base_url}/api/{self.session_name}/start-session", headers=headers)
+            response = self._request("POST", "start-session", headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 if 'qrcode' in data:
@@ -115,6 +192,8 @@ class WhatsAppConnector:
                 return False, f"Erro {response.status_code}: {error_msg}"
         except requests.exceptions.ConnectionError:
             return False, "Erro: Não foi possível conectar ao wppconnect na porta 21465."
+        except requests.exceptions.Timeout:
+            return False, "Erro: O wppconnect não respondeu a tempo ao iniciar a sessão."
         except Exception as e:
             return False, f"Erro inesperado: {str(e)}"
 
@@ -122,7 +201,7 @@ class WhatsAppConnector:
         try:
             if not self.token: return False
             headers = self._get_headers()
-            response = requests.get(f"{self.base_url}/api/{self.session_name}/check-connection-session", headers=headers)
+            response = self._request("GET", "check-connection-session", headers=headers)
             if response.status_code == 200:
                 data = response.json()
                 connected = (
@@ -131,18 +210,21 @@ class WhatsAppConnector:
                     data.get('state') == 'OPENING' or 'connected' in str(data).lower()
                 )
                 self.is_connected = connected
+                self.server_reachable = True
                 return self.is_connected
             self.is_connected = False
+            self.server_reachable = True
             return False
         except Exception:
             self.is_connected = False
+            self.server_reachable = False
             return False
 
     def close_session(self):
         try:
             if not self.token: return False, "Token não disponível"
             headers = self._get_headers()
-            response = requests.post(f"{self.base_url}/api/{self.session_name}/close-session", headers=headers)
+            response = self._request("POST", "close-session", headers=headers)
             if response.status_code == 200:
                 self.is_connected = False
                 return True, "Sessão fechada com sucesso"
@@ -156,7 +238,7 @@ class WhatsAppConnector:
                 return False, "Token não disponível para deslogar"
             
             headers = self._get_headers()
-            response = requests.post(f"{self.base_url}/api/{self.session_name}/logout-session", headers=headers)
+            response = self._request("POST", "logout-session", headers=headers)
             
             if response.status_code == 200:
                 return True, "Sessão deslogada com sucesso."
@@ -166,57 +248,2435 @@ class WhatsAppConnector:
         except Exception as e:
             return False, f"Erro inesperado ao deslogar: {str(e)}"
 
+    @staticmethod
+    def _error_message(response):
+        try: return response.json().get('message', response.text)
+        except (ValueError, AttributeError): return response.text
+
     def send_message(self, phone, message):
+        """Envia a mensagem; em caso de falha, a mensagem retornada é um SendFailure classificado."""
         try:
-            if not self.token: return False, "Token não disponível. Conecte primeiro."
-            clean_phone = ''.join(filter(str.isdigit, phone))
-            if len(clean_phone) <= 11 and not clean_phone.startswith("55"):
-                clean_phone = "55" + clean_phone
+            if not self.token: return False, SendFailure("Token não disponível. Conecte primeiro.", SendFailure.TRANSIENT)
+            clean_phone = PhoneNormalizer.e164(phone)
             payload = {"phone": clean_phone, "message": message}
             headers = self._get_headers()
-            response = requests.post(f"{self.base_url}/api/{self.session_name}/send-message", json=payload, headers=headers)
+            response = self._request("POST", "send-message", json=payload, headers=headers)
             if response.status_code in [200, 201]:
                 return True, "Mensagem enviada com sucesso"
-            error_msg = response.json().get('message', response.text)
-            return False, f"Erro ao enviar: {error_msg}"
+            return False, SendFailure.from_response(response.status_code, self._error_message(response))
+        except requests.exceptions.Timeout:
+            return False, SendFailure("Erro: Tempo limite excedido ao enviar a mensagem.", SendFailure.TRANSIENT)
+        except requests.exceptions.ConnectionError:
+            return False, SendFailure("Erro: Não foi possível conectar ao wppconnect na porta 21465.", SendFailure.TRANSIENT)
+        except Exception as e:
+            return False, SendFailure(f"Erro inesperado: {str(e)}", SendFailure.PERMANENT)
+
+    def check_number_status(self, phone):
+        """(True, existe) segundo o WhatsApp, ou (False, mensagem) se não foi possível verificar."""
+        try:
+            if not self.token: return False, "Token não disponível."
+            response = self._request("GET", "check-number-status", path=f"check-number-status/{PhoneNormalizer.e164(phone)}",
+                                     headers=self._get_headers())
+            if response.status_code in [200, 201]:
+                data = response.json().get("response")
+                if isinstance(data, dict) and "numberExists" in data: return True, bool(data["numberExists"])
+                return False, "Resposta inesperada ao verificar número"
+            return False, f"Erro ao verificar número: {response.status_code} - {self._error_message(response)}"
+        except requests.exceptions.Timeout:
+            return False, "Erro: Tempo limite excedido ao verificar o número."
+        except requests.exceptions.ConnectionError:
+            return False, "Erro: Não foi possível conectar ao wppconnect na porta 21465."
         except Exception as e:
             return False, f"Erro inesperado: {str(e)}"
 
-    def get_messages_for_contact(self, phone, include_me=True):
-        """Busca as últimas mensagens de uma conversa."""
+    def get_messages_for_contact(self, phone, include_me=True, limit=None):
+        """
+        Busca as últimas mensagens de uma conversa. Com `limit`, pede só as últimas
+        `limit` mensagens (get-messages); se o servidor não suportar, cai para a
+        conversa completa (all-messages-in-chat) e corta localmente.
+        """
         try:
             if not self.token:
                 return False, "Token não disponível."
             
-            clean_phone = ''.join(filter(str.isdigit, phone))
-            if len(clean_phone) <= 11 and not clean_phone.startswith("55"):
-                clean_phone = "55" + clean_phone
-            
-            url = f"{self.base_url}/api/{self.session_name}/all-messages-in-chat/{clean_phone}"
+            clean_phone = PhoneNormalizer.e164(phone)
             
             headers = self._get_headers()
+            if limit:
+                response = self._request("GET", "get-messages", path=f"get-messages/{clean_phone}", headers=headers,
+                                         params={'count': int(limit), 'direction': 'before'})
+                if response.status_code == 200:
+                    messages = response.json().get("response", [])
+                    if isinstance(messages, list):
+                        if not include_me: messages = [m for m in messages if not m.get('fromMe')]
+                        return True, messages[-limit:]
+
             params = {'includeMe': str(include_me).lower()}
             
-            response = requests.get(url, headers=headers, params=params)
+            response = self._request("GET", "all-messages-in-chat", path=f"all-messages-in-chat/{clean_phone}",
+                                     headers=headers, params=params)
 
             if response.status_code == 200:
-                messages = response.json()
-                return True, messages.get("response", [])
+                messages = response.json().get("response", [])
+                return True, messages[-limit:] if limit else messages
             else:
                 error_msg = response.json().get('message', response.text)
                 return False, f"Erro ao buscar mensagens: {error_msg}"
         except Exception as e:
             return False, f"Erro inesperado ao buscar mensagens: {str(e)}"
 
+# ===================================================================
+# CONECTOR ASSÍNCRONO (OPCIONAL, REQUER AIOHTTP)
+# ===================================================================
+class AsyncioLoop:
+    """Um único event loop numa thread de fundo, compartilhado por todos os conectores assíncronos."""
+    _loop = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._loop.run_forever, name="huby-asyncio", daemon=True).start()
+            return cls._loop
+
+    @classmethod
+    def run(cls, coro):
+        """Executa a corrotina no loop e espera o resultado (chamado de qualquer thread, menos a do loop)."""
+        return asyncio.run_coroutine_threadsafe(coro, cls.get()).result()
+
+
+class AsyncResponse:
+    """O pouco da Response do requests que o WhatsAppConnector usa."""
+    __slots__ = ("status_code", "text")
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncWhatsAppConnector(WhatsAppConnector):
+    """
+    Mesma interface do WhatsAppConnector, mas as requisições de todos os perfis
+    são multiplexadas no AsyncioLoop por uma única ClientSession do aiohttp, com
+    um pool de conexões compartilhado. Erros de rede viram as exceções do requests,
+    então o tratamento de erros dos métodos herdados continua valendo.
+    """
+    POOL_LIMIT = 32
+    _session = None
+
+    @classmethod
+    async def _shared_session(cls):
+        if cls._session is None or cls._session.closed: # só é acessada na thread do loop
+            cls._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=cls.POOL_LIMIT))
+        return cls._session
+
+    async def request_async(self, method, endpoint, path=None, **kwargs):
+        """Versão corrotina de _request, para quem já roda no AsyncioLoop."""
+        url = f"{self.base_url}/api/{self.session_name}/{path or endpoint}"
+        connect, read = kwargs.pop("timeout", self.timeouts.get(endpoint, (5, 30)))
+        session = await self._shared_session()
+        async with session.request(method, url, timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+                                   **kwargs) as response:
+            return AsyncResponse(response.status, await response.text())
+
+    def _request(self, method, endpoint, path=None, **kwargs):
+        try:
+            return AsyncioLoop.run(self.request_async(method, endpoint, path, **kwargs))
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except aiohttp.ClientConnectionError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    @classmethod
+    def shutdown(cls):
+        """Fecha o pool compartilhado (ao sair da aplicação; close() de cada perfil não o fecha)."""
+        if cls._session and not cls._session.closed: AsyncioLoop.run(cls._session.close())
+
+# ===================================================================
+# MONITOR DE CONEXÃO POR PERFIL
+# ===================================================================
+class ConnectionMonitor(threading.Thread):
+    """
+    Uma thread por perfil verificando a conexão com o wppconnect. Espaça as
+    verificações enquanto o estado não muda, recua exponencialmente quando o
+    servidor não responde e publica em `results` só as mudanças: (perfil, conectado).
+    """
+    FAST_INTERVAL = 2.0 # logo após conectar (leitura do QR Code) ou trocar de perfil
+    FAST_PERIOD = 120.0
+    MIN_INTERVAL = 5.0
+    STABLE_MAX = 60.0
+    STABLE_FACTOR = 1.5
+    ERROR_MAX = 120.0
+
+    def __init__(self, connector, results):
+        super().__init__(daemon=True)
+        self.connector = connector
+        self.results = results
+        self._wake = threading.Event()
+        self._stopped = False
+        self._fast_until = 0.0
+        self.interval = self.MIN_INTERVAL
+        self.failures = 0
+
+    def wake(self, fast=False):
+        """Verifica já; com fast=True, mantém verificações curtas por FAST_PERIOD segundos."""
+        if fast: self._fast_until = time.monotonic() + self.FAST_PERIOD
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def _next_interval(self, changed):
+        if not self.connector.server_reachable:
+            self.failures += 1
+            return min(self.ERROR_MAX, self.MIN_INTERVAL * 2 ** (self.failures - 1)) * random.uniform(0.8, 1.2)
+        self.failures = 0
+        if time.monotonic() < self._fast_until: return self.FAST_INTERVAL
+        if changed: return self.MIN_INTERVAL
+        return min(self.STABLE_MAX, self.interval * self.STABLE_FACTOR)
+
+    def run(self):
+        last = None
+        while not self._stopped:
+            connected = self.connector.check_connection_status()
+            changed = connected != last
+            if changed:
+                last = connected
+                self.results.put((self.connector.session_name, connected))
+                if connected: self._fast_until = 0.0
+            self.interval = self._next_interval(changed)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+# ===================================================================
+# RITMO DE ENVIO ADAPTATIVO
+# ===================================================================
+class SendPacer:
+    """
+    Ritmo de envio de um perfil. O intervalo fica dentro de [mín, máx] e se move
+    conforme os últimos resultados: erros e latência alta desaceleram, uma sequência
+    saudável acelera aos poucos. Sinais de bloqueio pausam o perfil, e os limites por
+    hora e por dia são contados numa janela deslizante.
+    """
+    WINDOW = 20
+    ERROR_RATE_SLOW = 0.2
+    SLOWDOWN_STEP = 0.25
+    SPEEDUP_STEP = 0.05
+    SLOW_LATENCY = 10.0
+    BLOCK_PAUSE = 15 * 60
+    BLOCK_SIGNALS = ("(429)", "rate limit", "rate-limit", "too many", "bann", "blocked", "spam")
+
+    def __init__(self, hourly_cap=0, daily_cap=0, sent_times=()):
+        self.hourly_cap = hourly_cap
+        self.daily_cap = daily_cap
+        self.position = 0.5 # 0 = intervalo mínimo, 1 = máximo
+        self.outcomes = deque(maxlen=self.WINDOW) # (sucesso, latência)
+        self.sent = deque(sent_times) # epochs dos envios nas últimas 24h
+        self.baseline_latency = None
+        self.paused_until = 0.0
+
+    def observe(self, success, latency, message=""):
+        """Registra o resultado de um envio e ajusta o ritmo."""
+        now = time.time()
+        # Número inválido não diz nada sobre a saúde do servidor ou do número que envia.
+        if getattr(message, "kind", None) == SendFailure.INVALID_NUMBER: success = None
+        self.outcomes.append((success is not False, latency))
+        if success: self.sent.append(now)
+        if self.baseline_latency is None or latency < self.baseline_latency:
+            self.baseline_latency = latency
+
+        if success is False and any(signal in str(message).lower() for signal in self.BLOCK_SIGNALS):
+            self.position = 1.0
+            self.paused_until = now + self.BLOCK_PAUSE
+            return
+        failures = sum(1 for ok, _ in self.outcomes if not ok)
+        slow = latency > max(self.SLOW_LATENCY, 3 * (self.baseline_latency or 0))
+        if success is False or slow or failures / len(self.outcomes) >= self.ERROR_RATE_SLOW:
+            self.position = min(1.0, self.position + self.SLOWDOWN_STEP)
+        else:
+            self.position = max(0.0, self.position - self.SPEEDUP_STEP)
+
+    def interval(self, min_interval, max_interval):
+        """Próximo intervalo em segundos, com variação aleatória, sempre dentro de [mín, máx]."""
+        base = min_interval + self.position * (max_interval - min_interval)
+        spread = 0.15 * (max_interval - min_interval)
+        return min(max_interval, max(min_interval, random.uniform(base - spread, base + spread)))
+
+    def wait(self):
+        """Segundos até o perfil poder enviar de novo (pausa por bloqueio ou limite por hora/dia)."""
+        now = time.time()
+        while self.sent and self.sent[0] < now - 86400: self.sent.popleft()
+        wait = max(0.0, self.paused_until - now)
+        if self.daily_cap and len(self.sent) >= self.daily_cap:
+            wait = max(wait, self.sent[-self.daily_cap] + 86400 - now)
+        if self.hourly_cap:
+            last_hour = [t for t in self.sent if t >= now - 3600]
+            if len(last_hour) >= self.hourly_cap:
+                wait = max(wait, last_hour[-self.hourly_cap] + 3600 - now)
+        return wait
+
+    @property
+    def error_rate(self):
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes) if self.outcomes else 0.0
+
+# ===================================================================
+# WORKER DE DISPARO DA CAMPANHA
+# ===================================================================
+class CampaignWorker(threading.Thread):
+    """
+    Consome a fila de envios da campanha fora da thread do Tk.
+    Cada resultado é publicado em `results`, que a interface drena via after().
+    """
+    def __init__(self, results):
+        super().__init__(daemon=True)
+        self.jobs = queue.Queue()
+        self.results = results
+
+    def submit(self, job):
+        self.jobs.put(job)
+
+    def stop(self):
+        self.jobs.put(None)
+
+    def run(self):
+        while (job := self.jobs.get()) is not None:
+            started = time.monotonic()
+            try:
+                success, message = job.connector.send_message(job.phone, job.message)
+            except Exception as e:
+                success, message = False, SendFailure(f"Erro inesperado: {str(e)}", SendFailure.PERMANENT)
+            self.results.put(SimpleNamespace(job=job, success=success, message=message,
+                                             latency=time.monotonic() - started))
+
+class CampaignLane:
+    """
+    Fatia da campanha atribuída a um perfil: contatos pendentes, fila de novas
+    tentativas (falhas transitórias), intervalo próprio e os agendamentos (after)
+    do próximo disparo e da contagem regressiva.
+    """
+    ROUND_ROBIN = "round_robin"
+    WEIGHTED = "weighted"
+    MAX_ATTEMPTS = 3
+    RETRY_BASE = 60.0
+
+    def __init__(self, profile, connector, contact_numbers, interval=None, weight=1):
+        self.profile = profile
+        self.connector = connector
+        self.pending = deque(contact_numbers)
+        self.interval = interval # (min, max) do perfil; None usa os campos da tela
+        self.weight = weight
+        self.after_id = None
+        self.countdown_after_id = None
+        self.countdown_n = None
+        self.done = False
+        self.pacer = None
+        self.retries = [] # heap de (instante monotonic, N) com novas tentativas agendadas
+        self.attempts = {} # N -> tentativas já feitas
+        self.current = None # N do contato do próximo disparo
+        self.messages = {} # N -> (template, texto) pré-renderizados ao montar a campanha
+
+    def schedule_retry(self, n):
+        """Agenda nova tentativa com backoff exponencial e jitter; retorna o atraso, ou False se as tentativas acabaram."""
+        attempts = self.attempts.get(n, 0)
+        if attempts >= self.MAX_ATTEMPTS: return False
+        delay = self.RETRY_BASE * 2 ** (attempts - 1) * random.uniform(0.5, 1.5)
+        heapq.heappush(self.retries, (time.monotonic() + delay, n))
+        return delay
+
+    def has_work(self):
+        return bool(self.pending or self.retries)
+
+    def peek(self):
+        """N do próximo contato: uma nova tentativa vencida tem prioridade sobre os pendentes."""
+        if self.retries and (self.retries[0][0] <= time.monotonic() or not self.pending): return self.retries[0][1]
+        return self.pending[0] if self.pending else None
+
+    def retry_wait(self):
+        """Segundos até a próxima tentativa vencer, quando só restam novas tentativas."""
+        if self.pending or not self.retries: return 0.0
+        return max(0.0, self.retries[0][0] - time.monotonic())
+
+    def take(self):
+        if self.retries and (self.retries[0][0] <= time.monotonic() or not self.pending):
+            return heapq.heappop(self.retries)[1]
+        return self.pending.popleft()
+
+    def drain(self):
+        """Remove e retorna todo o trabalho restante (pendentes e novas tentativas)."""
+        remaining = list(self.pending) + [n for _, n in sorted(self.retries)]
+        self.pending.clear(); self.retries = []
+        return remaining
+
+    @staticmethod
+    def shard(contact_numbers, weights):
+        """
+        Distribui os contatos entre os perfis por rodízio ponderado suave, intercalando
+        os perfis na ordem da lista. Pesos iguais resultam no rodízio simples.
+        """
+        shards = {profile: [] for profile in weights}
+        if not shards: return shards
+        total = sum(weights.values())
+        current = dict.fromkeys(weights, 0)
+        for n in contact_numbers:
+            for profile, weight in weights.items(): current[profile] += weight
+            chosen = max(current, key=current.get)
+            current[chosen] -= total
+            shards[chosen].append(n)
+        return shards
+
+# ===================================================================
+# BUSCA DO HISTÓRICO DE CONVERSA
+# ===================================================================
+class ChatHistoryFetcher:
+    """
+    Busca o histórico de conversa fora da thread do Tk numa única thread, com no
+    máximo uma requisição em andamento. Só o pedido mais recente espera a vez (os
+    anteriores são descartados), um pedido para a conversa já em andamento é
+    ignorado e os resultados ficam num cache LRU com TTL. Cada resultado é
+    publicado em `results` como (chave, sucesso, dados).
+    """
+    TTL = 60.0
+    MAX_ENTRIES = 200
+    LIMIT = 20
+
+    def __init__(self, results):
+        self.results = results
+        self._cache = OrderedDict() # (perfil, telefone) -> (instante, mensagens)
+        self._pending = None # (chave, conector) aguardando um worker
+        self._in_flight = None # chave da busca em andamento
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closed = False
+
+    def cached(self, key):
+        """Mensagens em cache ainda válidas para a chave, ou None."""
+        with self._cond:
+            entry = self._cache.get(key)
+            if not entry: return None
+            if time.monotonic() - entry[0] > self.TTL:
+                del self._cache[key]; return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def request(self, key, connector):
+        with self._cond:
+            if key == self._in_flight: self._pending = None; return # o resultado já está a caminho
+            self._pending = (key, connector) # substitui um pedido anterior ainda não iniciado
+            if not self._worker:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+            self._cond.notify()
+
+    def cancel(self):
+        """Descarta o pedido que ainda não começou."""
+        with self._cond: self._pending = None
+
+    def busy(self):
+        with self._cond: return bool(self._pending or self._in_flight is not None)
+
+    def invalidate(self, phone):
+        """Remove do cache as conversas do telefone (ex.: depois de um envio)."""
+        with self._cond:
+            for key in [k for k in self._cache if k[1] == phone]: del self._cache[key]
+
+    def close(self):
+        with self._cond:
+            self._closed = True; self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed: self._cond.wait()
+                if self._closed: return
+                (key, connector), self._pending = self._pending, None
+                self._in_flight = key
+            try:
+                success, data = connector.get_messages_for_contact(key[1], limit=self.LIMIT)
+            except Exception as e:
+                success, data = False, f"Erro inesperado ao buscar mensagens: {str(e)}"
+            with self._cond:
+                if success:
+                    self._cache[key] = (time.monotonic(), data)
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.MAX_ENTRIES: self._cache.popitem(last=False)
+                # Publicado antes de sair de _in_flight: quem vê busy() == False já tem o resultado na fila.
+                self.results.put((key, success, data))
+                self._in_flight = None
+
+# ===================================================================
+# TEMPLATES DE MENSAGEM COMPILADOS
+# ===================================================================
+class MessageTemplate:
+    """
+    Template compilado uma única vez em segmentos: texto fixo (já sem caracteres
+    fora do BMP), campos [coluna] e variações {a|b|c}, que podem conter campos.
+    Renderizar um contato é resolver os campos usados e juntar os segmentos.
+    """
+    TOKEN = re.compile(r"\[([^\[\]\n]+)\]|\{([^{}]*\|[^{}]*)\}")
+
+    def __init__(self, text, name=""):
+        self.name = name
+        self.fields = set()
+        self.segments = self._compile(self.filter_bmp(text))
+
+    @staticmethod
+    def filter_bmp(text):
+        text = str(text)
+        if not text or max(text) <= "\uffff": return text
+        return "".join(c for c in text if ord(c) <= 0xFFFF)
+
+    @staticmethod
+    def field_key(name):
+        return " ".join(ContactSearchIndex.fold(name).replace("_", " ").split())
+
+    def _compile(self, text):
+        """Lista de segmentos: str (fixo), ("campo", chave, original) ou ("variação", [alternativas compiladas])."""
+        segments, pos = [], 0
+        for match in self.TOKEN.finditer(text):
+            if match.start() > pos: segments.append(text[pos:match.start()])
+            if match.group(1) is not None:
+                key = self.field_key(match.group(1))
+                self.fields.add(key)
+                segments.append(("campo", key, match.group(0)))
+            else:
+                segments.append(("variação", [self._compile(option) for option in match.group(2).split("|")]))
+            pos = match.end()
+        if pos < len(text): segments.append(text[pos:])
+        return segments
+
+    def render(self, values, rng=random):
+        """Texto final para um contato; campos sem valor conhecido ficam como estão no template."""
+        parts = []
+        self._render(self.segments, values, rng, parts)
+        return "".join(parts)
+
+    def _render(self, segments, values, rng, parts):
+        for segment in segments:
+            if segment.__class__ is str: parts.append(segment)
+            elif segment[0] == "campo":
+                value = values.get(segment[1])
+                parts.append(segment[2] if value is None else value)
+            else:
+                self._render(rng.choice(segment[1]), values, rng, parts)
+
+    @staticmethod
+    def render_batch(templates, contacts, values_for, rng=random):
+        """Pré-renderiza uma campanha inteira: [(contato, template, texto)], sorteando um template por contato."""
+        fields = set().union(*(t.fields for t in templates)) if templates else set()
+        rendered = []
+        for contact in contacts:
+            template = rng.choice(templates)
+            rendered.append((contact, template, template.render(values_for(contact, fields), rng)))
+        return rendered
+
+# ===================================================================
+# REGISTRO DE CONTATO
+# ===================================================================
+class Contact:
+    """
+    Um contato da lista. Usa __slots__ para economizar memória em listas grandes;
+    os campos são alterados no próprio objeto e o telefone formatado só é
+    calculado quando a linha é exibida.
+    """
+    __slots__ = ("n", "nome", "telefone_id", "status", "disparo", "status_envio", "extra", "phone_key", "phone_issue")
+    CORE_COLUMNS = 4 # nome, (não usada), telefone, status; as demais ficam em `extra`
+
+    def __init__(self, n, nome, telefone_id, status="", disparo="", status_envio="", extra=()):
+        self.n = n
+        self.nome = nome
+        self.telefone_id = telefone_id
+        self.status = sys.intern(status)
+        self.disparo = sys.intern(disparo)
+        self.status_envio = status_envio
+        self.extra = extra
+        self.phone_key = self.phone_issue = "" # preenchidos pelo PhoneNormalizer
+
+    def column(self, index):
+        """Valor da coluna `index` da linha CSV, para os campos dos templates."""
+        if index == 0: return self.nome
+        if index == 2: return self.telefone_id
+        if index == 3: return self.status
+        index -= self.CORE_COLUMNS
+        return self.extra[index] if 0 <= index < len(self.extra) else ""
+
+    @property
+    def numero(self):
+        """N com três dígitos, como exibido na lista."""
+        return f"{self.n:03d}"
+
+    @property
+    def telefone(self):
+        return self.formatar_telefone(self.telefone_id)
+
+    @staticmethod
+    def formatar_telefone(numero_str):
+        n = ''.join(filter(str.isdigit, str(numero_str)))
+        if len(n) == 13: return f"+{n[:2]} ({n[2:4]}) {n[4:9]}-{n[9:]}"
+        if len(n) == 12: return f"+{n[:2]} ({n[2:4]}) {n[4:8]}-{n[8:]}"
+        if len(n) == 11: return f"({n[:2]}) {n[2:7]}-{n[7:]}"
+        if len(n) == 10: return f"({n[:2]}) {n[2:6]}-{n[6:]}"
+        return numero_str
+
+    def __repr__(self):
+        return f"Contact({self.n!r}, {self.nome!r}, {self.telefone_id!r}, {self.status!r})"
+
+# ===================================================================
+# NORMALIZAÇÃO E VALIDAÇÃO DE TELEFONES
+# ===================================================================
+class PhoneNormalizer:
+    """
+    Normaliza os telefones de uma lista uma única vez, no carregamento: cada
+    contato recebe a chave canônica (55 + DDD + número, sem símbolos) e, se for
+    o caso, o problema do número (tamanho, DDD ou duplicado na lista). Números
+    com problema não entram na fila de envio da campanha.
+    """
+    LENGTH, AREA_CODE, DUPLICATE = "Tamanho inválido", "DDD inválido", "Duplicado"
+    AREA_CODES = frozenset(map(str, (
+        11, 12, 13, 14, 15, 16, 17, 18, 19, 21, 22, 24, 27, 28, 31, 32, 33, 34, 35, 37, 38,
+        41, 42, 43, 44, 45, 46, 47, 48, 49, 51, 53, 54, 55, 61, 62, 63, 64, 65, 66, 67, 68, 69,
+        71, 73, 74, 75, 77, 79, 81, 82, 83, 84, 85, 86, 87, 88, 89, 91, 92, 93, 94, 95, 96, 97, 98, 99)))
+
+    def __init__(self, memo=None):
+        self._memo = {} if memo is None else memo # telefone como está no CSV -> (chave, problema)
+        self._first = {} # chave -> N do primeiro contato com o número
+
+    @staticmethod
+    def e164(phone):
+        """Chave canônica do telefone (usada no envio, no histórico e nas conversas)."""
+        digits = "".join(filter(str.isdigit, str(phone)))
+        return "55" + digits if 0 < len(digits) <= 11 else digits
+
+    @classmethod
+    def problem(cls, key):
+        if not key.startswith("55"): return "" if 8 <= len(key) <= 15 else cls.LENGTH # número estrangeiro
+        if len(key) not in (12, 13): return cls.LENGTH
+        return "" if key[2:4] in cls.AREA_CODES else cls.AREA_CODE
+
+    def apply(self, contact):
+        """Preenche phone_key/phone_issue do contato; retorna o próprio contato."""
+        if (cached := self._memo.get(contact.telefone_id)) is None:
+            key = self.e164(contact.telefone_id)
+            cached = self._memo[contact.telefone_id] = (key, self.problem(key))
+        contact.phone_key, contact.phone_issue = cached
+        if not contact.phone_issue and self._first.setdefault(contact.phone_key, contact.n) != contact.n:
+            contact.phone_issue = self.DUPLICATE
+        return contact
+
+    def forget(self, contact):
+        """Tira o contato do controle de duplicados (antes de trocar o telefone dele)."""
+        if self._first.get(contact.phone_key) == contact.n: del self._first[contact.phone_key]
+
+# ===================================================================
+# ARMAZENAMENTO INDEXADO DOS CONTATOS
+# ===================================================================
+class ContactStore:
+    """
+    Lista de contatos (Contact) com índices por N, por telefone e por item da Treeview.
+    """
+    EXTENDED = "extended"
+    INTERNED_FIELDS = ("status", "disparo")
+
+    def __init__(self):
+        self.contacts = []
+        self._pos_by_n = {}     # N -> posição em contacts
+        self._n_by_phone = {}   # telefone_id -> lista de N com esse número
+        self._n_by_item = {}    # iid da Treeview -> N
+        self._item_by_n = {}    # N -> iid da Treeview
+        self._listeners = []
+
+    def load(self, contacts):
+        self.contacts = list(contacts)
+        self._pos_by_n = {c.n: i for i, c in enumerate(self.contacts)}
+        self._n_by_phone = {}
+        for c in self.contacts:
+            self._n_by_phone.setdefault(c.telefone_id, []).append(c.n)
+        self.clear_items()
+        self._notify(None, None)
+
+    def extend(self, contacts):
+        """Acrescenta contatos ao final (carga progressiva), indexando só os novos."""
+        start = len(self.contacts)
+        for pos, c in enumerate(contacts, start):
+            self.contacts.append(c)
+            self._pos_by_n[c.n] = pos
+            self._n_by_phone.setdefault(c.telefone_id, []).append(c.n)
+        self._notify(start, self.EXTENDED)
+
+    def add_listener(self, listener):
+        """
+        Registra listener(n, campo); (None, None) indica recarga completa e
+        (posição, EXTENDED) indica contatos acrescentados a partir daquela posição.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, n, field):
+        for listener in self._listeners: listener(n, field)
+
+    def __len__(self):
+        return len(self.contacts)
+
+    def __iter__(self):
+        return iter(self.contacts)
+
+    def __getitem__(self, index):
+        return self.contacts[index]
+
+    def get(self, n):
+        pos = self._pos_by_n.get(n)
+        return None if pos is None else self.contacts[pos]
+
+    def index_of(self, n):
+        return self._pos_by_n.get(n, -1)
+
+    def find_by_phone(self, phone_id):
+        return [self.contacts[self._pos_by_n[n]] for n in self._n_by_phone.get(phone_id, ())]
+
+    def set_field(self, n, field, value):
+        """Altera um campo do contato N no próprio registro, mantendo os índices consistentes."""
+        pos = self._pos_by_n.get(n)
+        if pos is None: return None
+        contact = self.contacts[pos]
+        if field == "telefone_id" and contact.telefone_id != value:
+            self._unindex_phone(contact.telefone_id, n)
+            self._n_by_phone.setdefault(value, []).append(n)
+        setattr(contact, field, sys.intern(value) if field in self.INTERNED_FIELDS else value)
+        self._notify(n, field)
+        return contact
+
+    def _unindex_phone(self, phone_id, n):
+        if (ns := self._n_by_phone.get(phone_id)) and n in ns:
+            ns.remove(n)
+            if not ns: del self._n_by_phone[phone_id]
+
+    # --- Vínculo com as linhas da Treeview ---
+    def bind_item(self, item_id, n):
+        self._n_by_item[item_id] = n
+        self._item_by_n[n] = item_id
+
+    def unbind_item(self, n):
+        if (item_id := self._item_by_n.pop(n, None)) is not None:
+            self._n_by_item.pop(item_id, None)
+
+    def clear_items(self):
+        self._n_by_item.clear()
+        self._item_by_n.clear()
+
+    def n_for_item(self, item_id):
+        return self._n_by_item.get(item_id)
+
+    def item_for(self, n):
+        """iid da linha exibida para o contato N, ou None se ele estiver fora da visão atual."""
+        return self._item_by_n.get(n)
+
+    def get_by_item(self, item_id):
+        n = self._n_by_item.get(item_id)
+        return None if n is None else self.get(n)
+
+# ===================================================================
+# ÍNDICE DE BUSCA DOS CONTATOS
+# ===================================================================
+class ContactSearchIndex:
+    """
+    Índice da pesquisa: nomes normalizados (sem acento, minúsculos) e dígitos do
+    telefone indexados por trigramas, mais um índice por status.
+    Termos que estendem a busca anterior refinam o resultado anterior em vez de
+    varrer tudo de novo.
+    """
+    GRAM = 3
+    STATUS_PREFIX = "status:"
+
+    def __init__(self, store):
+        self.store = store
+        self._names, self._phones = {}, {}      # N -> texto normalizado
+        self._name_grams, self._phone_grams = {}, {}  # trigrama -> conjunto de N
+        self._by_status = {}                    # status normalizado -> conjunto de N
+        self._status_of = {}
+        self._last = None                       # (campo, termo, resultado)
+        store.add_listener(self.on_store_change)
+
+    @staticmethod
+    def fold(text):
+        text = unicodedata.normalize("NFKD", str(text))
+        return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+    @classmethod
+    def _grams(cls, text):
+        return {text[i:i + cls.GRAM] for i in range(len(text) - cls.GRAM + 1)}
+
+    @classmethod
+    def _texts(cls, contact):
+        return cls.fold(contact.nome), "".join(filter(str.isdigit, str(contact.telefone_id))), cls.fold(contact.status)
+
+    def build(self):
+        for attr in ("_names", "_phones", "_name_grams", "_phone_grams", "_by_status", "_status_of"):
+            getattr(self, attr).clear()
+        for contact in self.store: self._add(contact)
+        self._last = None
+
+    def _add(self, contact):
+        # Reatribuir a chave existente preserva a ordem da lista nos dicionários.
+        n = contact.n
+        name, phone, status = self._texts(contact)
+        self._names[n], self._phones[n], self._status_of[n] = name, phone, status
+        for g in self._grams(name): self._name_grams.setdefault(g, set()).add(n)
+        for g in self._grams(phone): self._phone_grams.setdefault(g, set()).add(n)
+        self._by_status.setdefault(status, set()).add(n)
+
+    def _remove(self, n):
+        for g in self._grams(self._names.get(n, "")): self._name_grams.get(g, set()).discard(n)
+        for g in self._grams(self._phones.get(n, "")): self._phone_grams.get(g, set()).discard(n)
+        self._by_status.get(self._status_of.get(n), set()).discard(n)
+
+    @classmethod
+    def prepare(cls, contacts):
+        """
+        Calcula os textos e trigramas de um lote fora da thread da interface (na
+        thread de carga); `merge` só junta os conjuntos prontos ao índice.
+        """
+        texts, name_grams, phone_grams, by_status = [], {}, {}, {}
+        for contact in contacts:
+            n = contact.n
+            name, phone, status = cls._texts(contact)
+            texts.append((n, name, phone, status))
+            for g in cls._grams(name): name_grams.setdefault(g, []).append(n)
+            for g in cls._grams(phone): phone_grams.setdefault(g, []).append(n)
+            by_status.setdefault(status, []).append(n)
+        return texts, name_grams, phone_grams, by_status
+
+    def merge(self, prepared):
+        """Junta um lote de `prepare`; chamar antes de ContactStore.extend, que então não reindexa o lote."""
+        texts, name_grams, phone_grams, by_status = prepared
+        for n, name, phone, status in texts:
+            self._names[n], self._phones[n], self._status_of[n] = name, phone, status
+        for grams, chunk in ((self._name_grams, name_grams), (self._phone_grams, phone_grams), (self._by_status, by_status)):
+            for key, ns in chunk.items(): grams.setdefault(key, set()).update(ns)
+        self._last = None
+
+    def on_store_change(self, n, field):
+        if n is None: self.build(); return
+        if field == ContactStore.EXTENDED:
+            for contact in self.store.contacts[n:]:
+                if contact.n not in self._names: self._add(contact)
+            self._last = None
+            return
+        if field not in ("nome", "status", "telefone_id"): return
+        self._remove(n)
+        if contact := self.store.get(n): self._add(contact)
+        self._last = None
+
+    def _in_list_order(self, matches):
+        if len(matches) * 8 < len(self._names):
+            return sorted(matches, key=self.store.index_of)
+        return [n for n in self._names if n in matches]
+
+    def search(self, term):
+        """Retorna os N que atendem ao termo, na ordem da lista, ou None se o termo estiver vazio."""
+        term = term.strip()
+        if not term: self._last = None; return None
+        if term.casefold().startswith(self.STATUS_PREFIX):
+            field, term = "status", self.fold(term[len(self.STATUS_PREFIX):].strip())
+        elif term.isdigit():
+            field = "phone"
+        else:
+            field, term = "name", self.fold(term)
+        texts, grams = (self._names, self._name_grams) if field == "name" else (self._phones, self._phone_grams)
+
+        if field == "status":
+            result = self._in_list_order(set().union(*(ns for status, ns in self._by_status.items() if term in status)))
+        elif self._last and self._last[0] == field and self._last[1] in term:
+            # Refina o resultado anterior: quem casa com o termo novo casava com o antigo.
+            result = [n for n in self._last[2] if term in texts[n]]
+        elif len(term) >= self.GRAM:
+            candidates = sorted((grams.get(g, set()) for g in self._grams(term)), key=len)
+            result = self._in_list_order({n for n in candidates[0].intersection(*candidates[1:]) if term in texts[n]})
+        else:
+            result = [n for n, text in texts.items() if term in text]
+        self._last = (field, term, result)
+        return result
+
+# ===================================================================
+# ORDENAÇÃO POR COLUNA COM CHAVES EM CACHE
+# ===================================================================
+class ContactSortIndex:
+    """
+    Mantém, por coluna, a ordem crescente dos contatos calculada sobre chaves
+    pré-computadas. A ordem fica em cache até que um campo daquela coluna mude.
+    """
+    COLUMN_FIELDS = {"n": "n", "nome": "nome", "telefone": "telefone_id", "status": "status",
+                     "disparo": "disparo", "status_envio": "status_envio"}
+
+    def __init__(self, store):
+        self.store = store
+        self._orders = {}   # coluna -> lista de N em ordem crescente
+        self._ranks = {}    # coluna -> {N: posição na ordem}
+        store.add_listener(self.on_store_change)
+
+    def _key(self, column):
+        if column == "n": return lambda c: c.n
+        if column == "telefone": return lambda c: "".join(filter(str.isdigit, str(c.telefone_id)))
+        field = self.COLUMN_FIELDS[column]
+        return lambda c: ContactSearchIndex.fold(getattr(c, field))
+
+    def on_store_change(self, n, changed):
+        if n is None or changed == ContactStore.EXTENDED:
+            self._orders.clear(); self._ranks.clear(); return
+        for column, field in self.COLUMN_FIELDS.items():
+            if field == changed:
+                self._orders.pop(column, None); self._ranks.pop(column, None)
+
+    def order(self, column):
+        if column not in self._orders:
+            key = self._key(column)
+            self._orders[column] = [c.n for c in sorted(self.store, key=key)]
+        return self._orders[column]
+
+    def sort(self, column, contact_numbers=None):
+        """Ordena um subconjunto (ex.: resultado da pesquisa) reaproveitando a ordem da coluna."""
+        order = self.order(column)
+        if contact_numbers is None: return order
+        if len(contact_numbers) * 8 < len(order):
+            if column not in self._ranks: self._ranks[column] = {n: i for i, n in enumerate(order)}
+            return sorted(contact_numbers, key=self._ranks[column].get)
+        wanted = set(contact_numbers)
+        return [n for n in order if n in wanted]
+
+# ===================================================================
+# LOG SÓ ACRESCENTADO COM CRC32
+# ===================================================================
+class AppendOnlyLog:
+    """
+    Arquivo lateral só acrescentado: uma entrada JSON por linha, prefixada pelo
+    CRC32 e gravada com fsync. Base do CsvEditJournal e do CampaignCheckpoint.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = self._repair()
+
+    def _repair(self):
+        """Descarta uma última linha incompleta (queda durante a escrita) e conta as entradas."""
+        try:
+            with open(self.path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+                return data.count(b"\n")
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _line(entry):
+        payload = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n"
+
+    def _append(self, entry):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8", newline="") as f:
+                f.write(self._line(entry)); f.flush(); os.fsync(f.fileno())
+            self.entries += 1
+
+    def _rewrite(self, entries):
+        """Substitui o log inteiro pelas entradas dadas (arquivo temporário + rename)."""
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                f.writelines(map(self._line, entries)); f.flush(); os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.entries = len(entries)
+
+    @staticmethod
+    def _read(path):
+        """Lê as entradas válidas; uma linha truncada ou corrompida (queda no meio da escrita) é ignorada."""
+        entries = []
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for line in f:
+                    crc, _, payload = line.rstrip("\n").partition(" ")
+                    try:
+                        if int(crc, 16) == zlib.crc32(payload.encode("utf-8")): entries.append(json.loads(payload))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+# ===================================================================
+# JOURNAL DE EDIÇÕES DA LISTA CSV
+# ===================================================================
+class CsvEditJournal(AppendOnlyLog):
+    """
+    Registra as edições da lista CSV num AppendOnlyLog lateral (<lista>.csv.journal),
+    uma linha por edição. O CSV só é reescrito na compactação, que roda em segundo
+    plano ou ao fechar a aplicação.
+    """
+    COMPACT_THRESHOLD = 200
+
+    def __init__(self, csv_path):
+        super().__init__(csv_path + ".journal")
+        self.csv_path = csv_path
+        self.compacting_path = csv_path + ".journal.compacting"
+        self._compact_lock = threading.Lock()
+
+    def _append(self, entry):
+        super()._append(entry)
+        if self.entries >= self.COMPACT_THRESHOLD:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def record_edit(self, line_index, column_index, value):
+        self._append({"l": int(line_index), "c": column_index, "v": value})
+
+    def record_append(self, row):
+        # Com a linha de destino, reaplicar a entrada não duplica o contato (ver apply).
+        with self._compact_lock: # a compactação não leva entradas para o CSV durante a contagem
+            self._append({"a": list(row), "l": self._next_line()})
+
+    def _next_line(self):
+        """Índice que a próxima linha acrescentada terá no CSV, contando as que ainda estão no journal."""
+        try:
+            with open(self.csv_path, "r", encoding="utf-8", newline="") as f: lines = sum(1 for _ in csv.reader(f))
+        except FileNotFoundError:
+            lines = 0
+        for line_index, _ in self.pending()[1]:
+            if line_index is None or line_index >= lines: lines += 1
+        return lines
+
+    def pending(self):
+        """Edições ainda não compactadas: ({linha: {coluna: valor}}, [(linha de destino, linha acrescentada)])."""
+        return self.fold(self._read(self.compacting_path) + self._read(self.path))
+
+    @staticmethod
+    def fold(entries):
+        edits, appended = {}, []
+        for entry in entries:
+            if "a" in entry: appended.append((entry.get("l"), entry["a"]))
+            else: edits.setdefault(entry["l"], {})[entry["c"]] = entry["v"]
+        return edits, appended
+
+    @staticmethod
+    def apply(rows, edits, appended):
+        for line_index, row in appended:
+            # O CSV já chega à linha: uma compactação interrompida entre o rename e a
+            # remoção do journal já a gravou. Entradas antigas, sem destino, sempre acrescentam.
+            if line_index is not None and line_index < len(rows): continue
+            rows.append(list(row))
+        for line_index, columns in edits.items():
+            if 0 < line_index < len(rows):
+                row = rows[line_index]
+                for column_index, value in columns.items():
+                    column_index = int(column_index)
+                    while len(row) <= column_index: row.append('')
+                    row[column_index] = value
+        return rows
+
+    def compact(self):
+        """Aplica o journal ao CSV (arquivo temporário + rename) e descarta as entradas aplicadas."""
+        with self._compact_lock:
+            with self._lock:
+                # Novas edições passam a ir para um journal novo enquanto o antigo é aplicado.
+                if os.path.exists(self.path) and not os.path.exists(self.compacting_path):
+                    os.replace(self.path, self.compacting_path)
+                    self.entries = 0
+            if not os.path.exists(self.compacting_path): return True
+            try:
+                with open(self.csv_path, "r", encoding="utf-8", newline="") as f: rows = list(csv.reader(f))
+                self.apply(rows, *self.fold(self._read(self.compacting_path)))
+                tmp_path = self.csv_path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                    csv.writer(f).writerows(rows); f.flush(); os.fsync(f.fileno())
+                os.replace(tmp_path, self.csv_path)
+                os.remove(self.compacting_path)
+                return True
+            except Exception as e:
+                print(f"ERRO ao compactar journal do CSV: {e}")
+                return False
+
+# ===================================================================
+# CHECKPOINT DA CAMPANHA
+# ===================================================================
+class CampaignCheckpoint(AppendOnlyLog):
+    """
+    Progresso da campanha num AppendOnlyLog lateral (<lista>.csv.campaign): início,
+    cada contato em envio e seu resultado, parada e fim, uma linha por evento.
+    Permite retomar depois de uma queda sem reenviar.
+    """
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    RETRY = "retry" # falha transitória com nova tentativa agendada
+
+    def __init__(self, csv_path):
+        super().__init__(csv_path + ".campaign")
+
+    def _append(self, entry):
+        entry["t"] = datetime.now().isoformat(timespec="seconds")
+        super()._append(entry)
+
+    def begin(self, start_n, profiles):
+        """Inicia uma campanha nova a partir do contato N, substituindo o registro da anterior."""
+        self._rewrite([{"begin": int(start_n), "p": list(profiles), "t": datetime.now().isoformat(timespec="seconds")}])
+
+    def resume(self, profiles):
+        self._append({"resume": True, "p": list(profiles)})
+
+    def record(self, n, telefone, state, profile=None):
+        self._append({"n": int(n), "tel": telefone, "s": state, "p": profile})
+
+    def stop(self):
+        self._append({"stop": True})
+
+    def finish(self):
+        self._append({"end": True})
+
+    def state(self):
+        """
+        Estado da última campanha: SimpleNamespace(start_n, finished, contacts {n: estado},
+        sent_phones, started_at), ou None se não houver campanha registrada.
+        """
+        entries = self._read(self.path)
+        if not entries or "begin" not in entries[0]: return None
+        state = SimpleNamespace(start_n=entries[0]["begin"], finished=False, contacts={},
+                                sent_phones=set(), started_at=entries[0].get("t"))
+        for entry in entries[1:]:
+            if "n" in entry:
+                state.contacts[entry["n"]] = entry["s"]
+                if entry["s"] == self.SENT: state.sent_phones.add(entry["tel"])
+            elif "end" in entry: state.finished = True
+            elif "resume" in entry: state.finished = False
+        return state
+
+# ===================================================================
+# LOG TAB-SEPARADO POR CHAVE
+# ===================================================================
+class KeyedLog:
+    """
+    Log tab-separado (chave, resto da linha) em que vale a última linha de cada
+    chave. É lido de uma vez para um dict, compactado ao carregar quando cresce
+    demais e, depois, só acrescentado. Base do NumberCheckCache e do SendHistory.
+    """
+    COMPACT_RATIO = 2
+    FSYNC = True
+    LABEL = "log"
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {} # chave -> resto da linha, interpretado só quando consultado
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8", newline="") as f: lines = f.read().split("\n")
+        except FileNotFoundError:
+            lines = [""]
+        except OSError as e:
+            print(f"Erro ao ler {self.LABEL}: {e}"); return
+        lines.pop() # vazia, ou uma linha truncada por uma queda durante a escrita
+        try: self._entries = dict(line.split("\t", 1) for line in lines)
+        except ValueError: self._entries = dict(line.split("\t", 1) for line in lines if "\t" in line)
+        if len(lines) > self.COMPACT_RATIO * len(self._entries) + 1000: self._compact()
+
+    def _keep(self, rest):
+        """Se o registro sobrevive à compactação."""
+        return True
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with self._lock:
+                self._entries = {key: rest for key, rest in self._entries.items() if self._keep(rest)}
+                with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                    f.writelines(f"{key}\t{rest}\n" for key, rest in self._entries.items())
+                    f.flush(); os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Erro ao compactar {self.LABEL}: {e}")
+
+    def _put(self, key, rest):
+        with self._lock:
+            self._entries[key] = rest
+            try:
+                with open(self.path, "a", encoding="utf-8", newline="") as f:
+                    f.write(f"{key}\t{rest}\n")
+                    if self.FSYNC: f.flush(); os.fsync(f.fileno())
+            except OSError as e:
+                print(f"Erro ao gravar {self.LABEL}: {e}")
+
+# ===================================================================
+# VERIFICAÇÃO PRÉVIA DOS NÚMEROS NO WHATSAPP
+# ===================================================================
+class NumberCheckCache(KeyedLog):
+    """
+    Resultado de check-number-status por telefone normalizado, num KeyedLog
+    (telefone, epoch, 1/0) válido por `ttl_hours`. A compactação descarta os vencidos.
+    """
+    LABEL = "cache de verificação de números"
+    FSYNC = False # perder as últimas verificações numa queda só obriga a refazê-las
+
+    def __init__(self, path, ttl_hours=168):
+        super().__init__(path)
+        self.ttl = ttl_hours * 3600
+
+    def _keep(self, rest):
+        ts = rest.partition("\t")[0]
+        return ts.isdigit() and time.time() - int(ts) < self.ttl
+
+    def get(self, phone_key):
+        """True/False se o telefone foi verificado dentro do TTL; None se precisa verificar."""
+        ts, _, exists = self._entries.get(phone_key, "").partition("\t")
+        if not ts.isdigit() or time.time() - int(ts) >= self.ttl: return None
+        return exists == "1"
+
+    def put(self, phone_key, exists):
+        self._put(phone_key, f"{int(time.time())}\t{int(exists)}")
+
+
+class NumberPreflight:
+    """
+    Verifica um lote de telefones antes da campanha com um pool limitado de
+    threads, repartindo as consultas entre os conectores. Cada resultado vai para
+    `results` como (preflight, telefone, existe), com existe None quando não foi
+    possível verificar; (preflight, None, None) marca o fim. Depois de várias
+    falhas seguidas (ex.: servidor sem o endpoint) desiste e os números seguem sem
+    verificação.
+    """
+    WORKERS = 4
+    MAX_CONSECUTIVE_ERRORS = 5
+
+    def __init__(self, connectors, phone_keys, cache, results):
+        self.connectors = connectors
+        self.cache = cache
+        self.results = results
+        self.total = len(phone_keys)
+        self.checked = 0
+        self._todo = deque(phone_keys)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._errors = 0
+        self.cancelled = threading.Event()
+
+    def start(self):
+        workers = min(self.WORKERS * len(self.connectors), len(self._todo))
+        self._running = workers
+        if not workers: self.results.put((self, None, None)); return
+        for i in range(workers):
+            threading.Thread(target=self._run, args=(self.connectors[i % len(self.connectors)],), daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _run(self, connector):
+        while not self.cancelled.is_set():
+            with self._lock:
+                if not self._todo: break
+                phone_key = self._todo.popleft()
+            try: success, exists = connector.check_number_status(phone_key)
+            except Exception as e: success, exists = False, str(e)
+            with self._lock:
+                self.checked += 1
+                self._errors = 0 if success else self._errors + 1
+                if self._errors >= self.MAX_CONSECUTIVE_ERRORS and self._todo:
+                    print(f"Verificação de números interrompida: {exists}")
+                    self._todo.clear()
+            if success: self.cache.put(phone_key, exists)
+            self.results.put((self, phone_key, exists if success else None))
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last: self.results.put((self, None, None))
+
+# ===================================================================
+# HISTÓRICO GLOBAL DE ENVIOS (DEDUPLICAÇÃO)
+# ===================================================================
+class SendHistory(KeyedLog):
+    """
+    Último envio de campanha por telefone normalizado, em todas as listas, num
+    KeyedLog (telefone, epoch, template, perfil; uma linha por envio). Cada
+    registro só é interpretado quando consultado.
+    """
+    LABEL = "histórico de envios"
+
+    def __init__(self, path, cooldown_hours=24):
+        super().__init__(path)
+        self.cooldown = cooldown_hours * 3600
+
+    def last(self, phone):
+        """(datetime, template, perfil) do último envio para o telefone, ou None."""
+        if not (rest := self._entries.get(PhoneNormalizer.e164(phone))): return None
+        try:
+            ts, template, profile = rest.split("\t")
+            return datetime.fromtimestamp(int(ts)), template, profile
+        except ValueError:
+            return None
+
+    def recent(self, phone):
+        """Último envio se ainda estiver dentro da janela de cooldown; None caso contrário."""
+        if self.cooldown <= 0 or not (entry := self.last(phone)): return None
+        return entry if time.time() - entry[0].timestamp() < self.cooldown else None
+
+    def sends_since(self, profile, since):
+        """Epochs dos envios do perfil desde `since` (o log guarda só o último por telefone)."""
+        times = []
+        with self._lock: entries = list(self._entries.values())
+        for rest in entries:
+            ts, _, tail = rest.partition("\t")
+            if tail.rpartition("\t")[2] == profile and ts.isdigit() and int(ts) >= since: times.append(int(ts))
+        return sorted(times)
+
+    def record(self, phone, template="", profile=""):
+        clean = lambda v: str(v or "").replace("\t", " ").replace("\n", " ")
+        self._put(PhoneNormalizer.e164(phone), f"{int(time.time())}\t{clean(template)}\t{clean(profile)}")
+
+# ===================================================================
+# COMENTÁRIOS COM GRAVAÇÃO ADIADA
+# ===================================================================
+class CommentStore:
+    """
+    Observações por telefone mantidas em memória e gravadas em comentarios.json
+    em lote (write-behind): por tempo, por quantidade de alterações ou no flush()
+    final. A gravação é atômica (arquivo temporário + rename).
+    """
+    FLUSH_INTERVAL = 5.0
+    FLUSH_THRESHOLD = 50
+
+    def __init__(self, path):
+        self.path = path
+        self._data = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding='utf-8') as f: data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError): data = {}
+        with self._lock:
+            self._data, self._dirty = data, set()
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if self._data.get(key) == value: return
+            self._data[key] = value
+            self._dirty.add(key)
+            flush_now = len(self._dirty) >= self.FLUSH_THRESHOLD
+            # O timer é armado sob o lock, o mesmo com que flush() o cancela: nunca há dois.
+            if not flush_now and not self._timer:
+                self._timer = threading.Timer(self.FLUSH_INTERVAL, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            threading.Thread(target=self.flush, daemon=True).start()
+
+    def append_line(self, key, line):
+        """Acrescenta uma linha à observação do telefone e retorna o texto completo."""
+        with self._lock: existing = self._data.get(key, "").strip()
+        new_comment = f"{existing}\n{line}" if existing else line
+        self[key] = new_comment
+        return new_comment
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._timer: self._timer.cancel(); self._timer = None
+                if not self._dirty: return True
+                snapshot, dirty = dict(self._data), self._dirty
+                self._dirty = set()
+            try:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding='utf-8') as f:
+                    json.dump(snapshot, f, indent=4, ensure_ascii=False); f.flush(); os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                return True
+            except Exception as e:
+                print(f"Erro ao salvar comentários: {e}")
+                with self._lock: self._dirty |= dirty
+                return False
+
+# ===================================================================
+# BACKEND OPCIONAL EM SQLITE
+# ===================================================================
+class HubyDatabase:
+    """
+    Armazenamento opcional em SQLite (modo WAL) para listas de contatos,
+    observações, eventos de comentário e tentativas de envio.
+    A lista CSV continua sendo a origem: é importada uma vez e reaproveitada
+    enquanto o arquivo não mudar; as edições viram UPDATEs de uma linha e o CSV
+    é regravado a partir do banco na exportação. Até lá, cada edição também fica
+    em list_edits (no formato do CsvEditJournal), para ser reaplicada se o CSV
+    mudar fora do Huby antes da exportação.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS lists (
+            id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime REAL, size INTEGER,
+            header TEXT NOT NULL DEFAULT '[]', dirty INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE IF NOT EXISTS contacts (
+            list_id INTEGER NOT NULL, n INTEGER NOT NULL, nome TEXT, telefone TEXT, status TEXT,
+            row TEXT NOT NULL, PRIMARY KEY (list_id, n)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_contacts_telefone ON contacts(telefone);
+        CREATE TABLE IF NOT EXISTS list_edits (id INTEGER PRIMARY KEY, list_id INTEGER NOT NULL, entry TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS comments (telefone TEXT PRIMARY KEY, text TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS comment_events (
+            id INTEGER PRIMARY KEY, telefone TEXT NOT NULL, created_at TEXT NOT NULL, line TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS idx_comment_events_telefone ON comment_events(telefone);
+        CREATE TABLE IF NOT EXISTS send_attempts (
+            id INTEGER PRIMARY KEY, list_id INTEGER, n INTEGER, telefone TEXT NOT NULL, profile TEXT,
+            success INTEGER NOT NULL, message TEXT, created_at TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS idx_send_attempts_telefone ON send_attempts(telefone);
+    """
+    BATCH_SIZE = 5000
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock: self.conn.close()
+
+    @staticmethod
+    def _signature(csv_path):
+        st = os.stat(csv_path)
+        return st.st_mtime, st.st_size
+
+    def _list_id(self, csv_path, create=False):
+        row = self.conn.execute("SELECT id FROM lists WHERE path = ?", (csv_path,)).fetchone()
+        if row or not create: return row[0] if row else None
+        return self.conn.execute("INSERT INTO lists (path) VALUES (?)", (csv_path,)).lastrowid
+
+    # --- Listas de contatos ---
+    def current_row_count(self, csv_path):
+        """Quantidade de contatos da cópia no banco, ou None se o CSV mudou desde a importação."""
+        with self._lock:
+            row = self.conn.execute("SELECT id, mtime, size, dirty FROM lists WHERE path = ?", (csv_path,)).fetchone()
+            if not row: return None
+            if (row[1], row[2]) != self._signature(csv_path):
+                # Edições não exportadas sem registro em list_edits (banco anterior a ela) não podem ser
+                # reaplicadas: mantém a cópia do banco em vez de perdê-las.
+                if not row[3] or self.conn.execute("SELECT 1 FROM list_edits WHERE list_id = ? LIMIT 1", (row[0],)).fetchone():
+                    return None
+                print(f"{os.path.basename(csv_path)} mudou fora do Huby com edições ainda não exportadas; usando a cópia do banco.")
+            return self.conn.execute("SELECT COUNT(*) FROM contacts WHERE list_id = ?", (row[0],)).fetchone()[0]
+
+    def pending_edits(self, csv_path):
+        """Edições ainda não exportadas para o CSV, como CsvEditJournal.pending()."""
+        with self._lock:
+            entries = self.conn.execute("SELECT e.entry FROM list_edits e JOIN lists l ON l.id = e.list_id "
+                                        "WHERE l.path = ? AND l.dirty = 1 ORDER BY e.id", (csv_path,)).fetchall()
+        return CsvEditJournal.fold(json.loads(entry) for (entry,) in entries)
+
+    def iter_rows(self, csv_path, page_size=BATCH_SIZE):
+        """Gera (N, linha) em páginas, sem segurar o banco entre uma página e outra."""
+        with self._lock: list_id = self._list_id(csv_path)
+        last_n = 0
+        while True:
+            with self._lock:
+                page = self.conn.execute("SELECT n, row FROM contacts WHERE list_id = ? AND n > ? ORDER BY n LIMIT ?",
+                                         (list_id, last_n, page_size)).fetchall()
+            if not page: return
+            for n, raw in page: yield n, json.loads(raw)
+            last_n = page[-1][0]
+
+    def header(self, csv_path):
+        with self._lock:
+            row = self.conn.execute("SELECT header FROM lists WHERE path = ?", (csv_path,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def cached_rows(self, csv_path):
+        """Linhas da lista (cabeçalho na posição 0) se o CSV não mudou desde a importação; senão None."""
+        if self.current_row_count(csv_path) is None: return None
+        rows = [self.header(csv_path)]
+        for n, row in self.iter_rows(csv_path):
+            while len(rows) < n: rows.append([])
+            rows.append(row)
+        return rows
+
+    def import_rows(self, csv_path, rows, keep_edits=False):
+        """
+        Substitui a cópia da lista no banco, em lotes dentro de uma única transação.
+        Com keep_edits, `rows` já tem as edições não exportadas reaplicadas: a lista continua
+        pendente de exportação e list_edits é mantido.
+        """
+        with self._lock, self.conn:
+            list_id = self._list_id(csv_path, create=True)
+            self.conn.execute("DELETE FROM contacts WHERE list_id = ?", (list_id,))
+            if not keep_edits: self.conn.execute("DELETE FROM list_edits WHERE list_id = ?", (list_id,))
+            batch = []
+            for n, row in enumerate(rows[1:], 1):
+                if not row: continue
+                batch.append((list_id, n, row[0] if row else "", row[2] if len(row) > 2 else "",
+                              row[3] if len(row) > 3 else "", json.dumps(row, ensure_ascii=False)))
+                if len(batch) >= self.BATCH_SIZE:
+                    self.conn.executemany("INSERT INTO contacts VALUES (?, ?, ?, ?, ?, ?)", batch); batch = []
+            self.conn.executemany("INSERT INTO contacts VALUES (?, ?, ?, ?, ?, ?)", batch)
+            mtime, size = self._signature(csv_path)
+            self.conn.execute("UPDATE lists SET mtime = ?, size = ?, header = ?, dirty = ? WHERE id = ?",
+                              (mtime, size, json.dumps(rows[0] if rows else [], ensure_ascii=False), int(keep_edits), list_id))
+
+    def update_field(self, csv_path, n, column_index, value):
+        with self._lock, self.conn:
+            list_id = self._list_id(csv_path)
+            found = self.conn.execute("SELECT row FROM contacts WHERE list_id = ? AND n = ?", (list_id, n)).fetchone()
+            if not found: return False
+            row = json.loads(found[0])
+            while len(row) <= column_index: row.append('')
+            row[column_index] = value
+            self.conn.execute("UPDATE contacts SET nome = ?, telefone = ?, status = ?, row = ? WHERE list_id = ? AND n = ?",
+                              (row[0], row[2] if len(row) > 2 else "", row[3] if len(row) > 3 else "",
+                               json.dumps(row, ensure_ascii=False), list_id, n))
+            self.conn.execute("INSERT INTO list_edits (list_id, entry) VALUES (?, ?)",
+                              (list_id, json.dumps({"l": int(n), "c": column_index, "v": value}, ensure_ascii=False)))
+            self.conn.execute("UPDATE lists SET dirty = 1 WHERE id = ?", (list_id,))
+            return True
+
+    def append_row(self, csv_path, row):
+        with self._lock, self.conn:
+            list_id = self._list_id(csv_path)
+            n = self.conn.execute("SELECT COALESCE(MAX(n), 0) + 1 FROM contacts WHERE list_id = ?", (list_id,)).fetchone()[0]
+            self.conn.execute("INSERT INTO contacts VALUES (?, ?, ?, ?, ?, ?)",
+                              (list_id, n, row[0], row[2] if len(row) > 2 else "", row[3] if len(row) > 3 else "",
+                               json.dumps(list(row), ensure_ascii=False)))
+            self.conn.execute("INSERT INTO list_edits (list_id, entry) VALUES (?, ?)",
+                              (list_id, json.dumps({"a": list(row)}, ensure_ascii=False)))
+            self.conn.execute("UPDATE lists SET dirty = 1 WHERE id = ?", (list_id,))
+            return n
+
+    def export_list(self, csv_path, dest_path=None):
+        """Grava a lista do banco em CSV (temporário + rename). Sem destino, regrava a própria lista."""
+        rows = self.cached_rows(csv_path) if dest_path else None
+        with self._lock:
+            list_id = self._list_id(csv_path)
+            if list_id is None: return False
+            header = json.loads(self.conn.execute("SELECT header FROM lists WHERE id = ?", (list_id,)).fetchone()[0])
+            if rows is None:
+                rows = [header]
+                for n, raw in self.conn.execute("SELECT n, row FROM contacts WHERE list_id = ? ORDER BY n", (list_id,)):
+                    while len(rows) < n: rows.append([])
+                    rows.append(json.loads(raw))
+        target = dest_path or csv_path
+        tmp_path = target + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows); f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+        if not dest_path:
+            mtime, size = self._signature(csv_path)
+            with self._lock, self.conn:
+                self.conn.execute("UPDATE lists SET mtime = ?, size = ?, dirty = 0 WHERE id = ?", (mtime, size, list_id))
+                self.conn.execute("DELETE FROM list_edits WHERE list_id = ?", (list_id,))
+        return True
+
+    def is_dirty(self, csv_path):
+        with self._lock:
+            row = self.conn.execute("SELECT dirty FROM lists WHERE path = ?", (csv_path,)).fetchone()
+            return bool(row and row[0])
+
+    # --- Observações e envios ---
+    def get_comment(self, telefone):
+        with self._lock:
+            row = self.conn.execute("SELECT text FROM comments WHERE telefone = ?", (telefone,)).fetchone()
+            return row[0] if row else None
+
+    def set_comment(self, telefone, text, event_line=None):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT INTO comments VALUES (?, ?) ON CONFLICT(telefone) DO UPDATE SET text = excluded.text",
+                              (telefone, text))
+            if event_line is not None:
+                self.conn.execute("INSERT INTO comment_events (telefone, created_at, line) VALUES (?, ?, ?)",
+                                  (telefone, datetime.now().isoformat(timespec="seconds"), event_line))
+
+    def import_comments(self, comments):
+        with self._lock, self.conn:
+            if self.conn.execute("SELECT 1 FROM comments LIMIT 1").fetchone(): return
+            self.conn.executemany("INSERT INTO comments VALUES (?, ?)", comments.items())
+
+    def record_send(self, csv_path, n, telefone, profile, success, message):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT INTO send_attempts (list_id, n, telefone, profile, success, message, created_at) "
+                              "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (self._list_id(csv_path) if csv_path else None, int(n) if n else None, telefone, profile,
+                               int(bool(success)), str(message), datetime.now().isoformat(timespec="seconds")))
+
+class SQLiteCommentStore:
+    """Mesma interface do CommentStore, gravando cada alteração como uma linha no HubyDatabase."""
+    def __init__(self, database, json_path):
+        self.database = database
+        self.json_path = json_path
+
+    def load(self):
+        # Na primeira ativação, migra o comentarios.json existente para o banco.
+        try:
+            with open(self.json_path, "r", encoding='utf-8') as f: self.database.import_comments(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError): pass
+
+    def get(self, key, default=None):
+        value = self.database.get_comment(key)
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        if self.database.get_comment(key) != value: self.database.set_comment(key, value)
+
+    def append_line(self, key, line):
+        existing = (self.database.get_comment(key) or "").strip()
+        new_comment = f"{existing}\n{line}" if existing else line
+        self.database.set_comment(key, new_comment, event_line=line)
+        return new_comment
+
+    def flush(self):
+        return True
+
+# ===================================================================
+# CARREGAMENTO DA LISTA EM SEGUNDO PLANO
+# ===================================================================
+class ContactListLoader(threading.Thread):
+    """
+    Lê a lista (CSV ou cópia no HubyDatabase) numa thread e publica os contatos
+    em lotes na fila `results` como (tipo, loader, dados, progresso), com tipo
+    "chunk", "done" ou "error"; os dados de "chunk" são (contatos, índice), com o
+    resultado de `index_chunk(contatos)` calculado na própria thread, ou None.
+    Pode ser cancelado entre um lote e outro.
+    """
+    CHUNK_SIZE = 2000
+
+    def __init__(self, filepath, results, build_contact, journal=None, database=None, index_chunk=None):
+        super().__init__(daemon=True)
+        self.filepath = filepath
+        self.results = results
+        self.build_contact = build_contact
+        self.index_chunk = index_chunk
+        self.journal = journal
+        self.database = database
+        self.cancelled = threading.Event()
+        self.header = []
+        self._bytes_read = 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _csv_lines(self, file):
+        # Lê em binário para saber quantos bytes já foram consumidos (progresso).
+        for raw in file:
+            self._bytes_read += len(raw)
+            yield raw.decode("utf-8")
+
+    def _numbered_rows(self):
+        """Gera (N, linha, progresso) na ordem do arquivo, já com as edições pendentes aplicadas."""
+        if self.database and (total := self.database.current_row_count(self.filepath)) is not None:
+            self.header = self.database.header(self.filepath)
+            for i, (n, row) in enumerate(self.database.iter_rows(self.filepath), 1):
+                yield n, row, i / max(total, 1)
+            return
+        # CSV novo ou alterado fora do Huby: as edições ainda não gravadas nele (journal ou,
+        # no banco, as não exportadas) são reaplicadas sobre o arquivo atual.
+        if self.database: edits, appended = self.database.pending_edits(self.filepath)
+        else: edits, appended = self.journal.pending() if self.journal else ({}, [])
+        if self.database and (edits or appended):
+            print(f"{os.path.basename(self.filepath)} mudou fora do Huby; reaplicando {len(edits) + len(appended)} edições ainda não exportadas.")
+        imported = [] if self.database else None
+        total = max(os.path.getsize(self.filepath), 1)
+        with open(self.filepath, "rb") as file:
+            n = 0
+            for n, row in enumerate(csv.reader(self._csv_lines(file))):
+                if n == 0:
+                    self.header = row
+                    if imported is not None: imported.append(row)
+                    continue
+                if n in edits: row = CsvEditJournal.apply([[], row], {1: edits[n]}, [])[1]
+                if imported is not None: imported.append(row)
+                yield n, row, self._bytes_read / total
+        for line_index, row in appended:
+            if line_index is not None and line_index <= n: continue # já está no CSV (ver CsvEditJournal.apply)
+            n += 1
+            if n in edits: row = CsvEditJournal.apply([[], row], {1: edits[n]}, [])[1]
+            if imported is not None: imported.append(row)
+            yield n, row, 1.0
+        if imported is not None and not self.cancelled.is_set():
+            self.database.import_rows(self.filepath, imported, keep_edits=bool(edits or appended))
+
+    def _publish(self, chunk, progress):
+        index = self.index_chunk(chunk) if self.index_chunk else None
+        self.results.put(("chunk", self, (chunk, index), progress))
+
+    def run(self):
+        try:
+            chunk, progress = [], 0.0
+            for n, row, progress in self._numbered_rows():
+                if self.cancelled.is_set(): return
+                if not row: continue
+                chunk.append(self.build_contact(n, row))
+                if len(chunk) >= self.CHUNK_SIZE:
+                    self._publish(chunk, progress); chunk = []
+            if self.cancelled.is_set(): return
+            if chunk: self._publish(chunk, progress)
+            self.results.put(("done", self, None, 1.0))
+        except Exception as e:
+            self.results.put(("error", self, str(e), 0.0))
+
+# ===================================================================
+# LISTA VIRTUALIZADA SOBRE A TREEVIEW
+# ===================================================================
+class VirtualTreeview:
+    """
+    Materializa na ttk.Treeview apenas as linhas da área visível (mais uma margem),
+    enquanto a barra de rolagem reflete a quantidade lógica de linhas.
+    A ordem de exibição é uma lista de N; os dados vêm sempre do ContactStore.
+    """
+    BUFFER = 10
+
+    def __init__(self, tree, scrollbar, store, row_values, on_select=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.store = store
+        self.row_values = row_values
+        self.on_select = on_select
+        self._rows = []         # N na ordem base; exibidos de trás para frente se reversed
+        self.reversed = False
+        self._pos = {}          # N -> posição em rows
+        self.first = 0          # primeira linha lógica visível
+        self.visible = 20       # linhas que cabem na área visível
+        self.row_tags = {}      # N -> tags aplicadas à linha
+        self._selected = []     # seleção lógica (N), mesmo fora da área materializada
+        self._focus = None
+        self._expected_selection = ()
+        self._materialized = [] # N materializados, na ordem da Treeview
+
+        scrollbar.config(command=self.yview)
+        tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        tree.bind("<Configure>", self._on_resize)
+        tree.bind("<MouseWheel>", lambda e: self._scroll_units(-1 * (e.delta // 120) * 3))
+        tree.bind("<Button-4>", lambda e: self._scroll_units(-3))
+        tree.bind("<Button-5>", lambda e: self._scroll_units(3))
+
+    # --- Dados ---
+    def set_rows(self, rows, reverse=False):
+        """Troca a ordem exibida (carga, filtro, ordenação), preservando a seleção quando possível."""
+        self._rows = rows
+        self.reversed = reverse
+        self._pos = {n: i for i, n in enumerate(self._rows)}
+        self._selected = [n for n in self._selected if n in self._pos]
+        if self._focus not in self._pos: self._focus = None
+        self.first = self._clamp(self.first)
+        self._rebuild()
+
+    def reset(self):
+        self.row_tags.clear()
+        self._selected = []
+        self._focus = None
+        self.first = 0
+
+    def append_rows(self, rows):
+        """Acrescenta linhas ao final da ordem atual sem rematerializar a área visível."""
+        start = len(self._rows)
+        self._rows.extend(rows)
+        self._pos.update((n, i) for i, n in enumerate(rows, start))
+        if self.reversed or start < self.first + self.visible + self.BUFFER: self._render()
+        else: self._update_scrollbar()
+
+    def set_reversed(self, reverse):
+        """Inverte a ordem exibida sem reordenar os dados."""
+        if reverse == self.reversed: return
+        self.reversed = reverse
+        self.first = 0
+        self._rebuild()
+        if self._focus: self.see(self._focus)
+
+    def row_at(self, index):
+        return self._rows[-1 - index] if self.reversed else self._rows[index]
+
+    def position(self, n):
+        pos = self._pos.get(n)
+        if pos is None or not self.reversed: return pos
+        return len(self._rows) - 1 - pos
+
+    def __len__(self):
+        return len(self._rows)
+
+    def exists(self, n):
+        return n in self._pos
+
+    def refresh_row(self, n):
+        if item := self.store.item_for(n):
+            self.tree.item(item, values=self.row_values(self.store.get(n)))
+
+    def tags(self, n):
+        return self.row_tags.get(n, ())
+
+    def set_tags(self, n, tags):
+        tags = tuple(tags)
+        if tags: self.row_tags[n] = tags
+        else: self.row_tags.pop(n, None)
+        if item := self.store.item_for(n):
+            self.tree.item(item, tags=tags)
+
+    # --- Seleção ---
+    def selection(self):
+        return list(self._selected)
+
+    def focus(self):
+        return self._focus
+
+    def select(self, n, notify=True):
+        if n not in self._pos: return
+        changed = self._selected != [n]
+        self._selected = [n]; self._focus = n
+        self.see(n)
+        self._apply_selection()
+        if changed and notify and self.on_select: self.on_select(None)
+
+    def move_selection(self, delta):
+        if not self._rows: return
+        if (pos := self.position(self._focus)) is None: pos = -1 if delta > 0 else len(self._rows)
+        self.select(self.row_at(max(0, min(len(self._rows) - 1, pos + delta))))
+
+    def see(self, n):
+        pos = self.position(n)
+        if pos is None: return
+        if pos < self.first: self._scroll_to(pos)
+        elif pos >= self.first + self.visible: self._scroll_to(pos - self.visible + 1)
+
+    def _apply_selection(self):
+        items = tuple(i for n in self._selected if (i := self.store.item_for(n)))
+        self._expected_selection = items
+        if set(self.tree.selection()) != set(items):
+            self.tree.selection_set(items)
+        if self._focus and (item := self.store.item_for(self._focus)):
+            self.tree.focus(item)
+
+    def _on_tree_select(self, event):
+        current = self.tree.selection()
+        # Mudanças provocadas pela própria rematerialização não são seleção do usuário.
+        if set(current) == set(self._expected_selection): return
+        selected = [n for i in current if (n := self.store.n_for_item(i)) is not None]
+        self._expected_selection = current
+        if selected == self._selected: return
+        self._selected = selected
+        self._focus = self.store.n_for_item(self.tree.focus()) or (selected[0] if selected else None)
+        if self.on_select: self.on_select(event)
+
+    # --- Rolagem ---
+    def yview(self, *args):
+        if not args: return
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * len(self._rows)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self._scroll_to(self.first + (amount * self.visible if args[2] == "pages" else amount))
+
+    def _scroll_units(self, amount):
+        self._scroll_to(self.first + amount)
+        return "break"
+
+    def _clamp(self, first):
+        return max(0, min(first, len(self._rows) - self.visible))
+
+    def _scroll_to(self, first):
+        first = self._clamp(first)
+        if first != self.first:
+            self.first = first
+            self._render()
+
+    def _on_resize(self, event=None):
+        rowheight = int(ttk.Style(self.tree).lookup("Treeview", "rowheight") or 20)
+        header = 0
+        if self._materialized and (bbox := self.tree.bbox(self.store.item_for(self._materialized[0]))):
+            header = bbox[1]
+        visible = max(1, (self.tree.winfo_height() - (header or rowheight)) // rowheight)
+        if visible != self.visible:
+            self.visible = visible
+            self.first = self._clamp(self.first)
+            self._render()
+
+    # --- Materialização ---
+    def _rebuild(self):
+        self.tree.delete(*self.tree.get_children())
+        self.store.clear_items()
+        self._materialized = []
+        self._render()
+
+    def _render(self):
+        wanted = [self.row_at(i) for i in range(self.first, min(len(self._rows), self.first + self.visible + self.BUFFER))]
+        wanted_set = set(wanted)
+        leaving = [n for n in self._materialized if n not in wanted_set]
+        if leaving:
+            self.tree.delete(*(self.store.item_for(n) for n in leaving))
+            for n in leaving: self.store.unbind_item(n)
+        # As linhas que permanecem mantêm a ordem relativa; basta inserir as novas na posição.
+        for index, n in enumerate(wanted):
+            if self.store.item_for(n) is None:
+                item = self.tree.insert("", index, values=self.row_values(self.store.get(n)), tags=self.row_tags.get(n, ()))
+                self.store.bind_item(item, n)
+        self._materialized = wanted
+        self.tree.yview_moveto(0)
+        self._apply_selection()
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self._rows)
+        if total: self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+        else: self.scrollbar.set(0, 1)
+
+# ===================================================================
+# MOTOR DA CAMPANHA (INDEPENDENTE DA INTERFACE)
+# ===================================================================
+class CampaignEngine:
+    """
+    Lógica da campanha sem Tk: divisão dos contatos entre os perfis, verificação
+    prévia dos números, ritmo e novas tentativas, templates, checkpoint, status no
+    CSV, comentários e relatório. Quem herda fornece after()/after_cancel() (o
+    App usa os do Tk; o HeadlessCampaign, um laço próprio), os atributos da lista
+    carregada (contact_store, comments, send_history, number_check_cache,
+    message_templates, list_columns, current_filepath, csv_journal, database,
+    campaign_checkpoint) e, se quiser, os ganchos _on_* / _show_* de exibição.
+    """
+    def _init_campaign_state(self):
+        self.auto_send_running = False
+        self.auto_send_stop_requested = False
+        self.campaign_id = 0
+        self.campaign_results = queue.Queue()
+        self.campaign_workers = {} # um CampaignWorker por perfil
+        self.campaign_lanes = {} # perfil -> CampaignLane da campanha em andamento
+        self.campaign_checkpoint = None
+        self.campaign_poll_id = None
+        self.number_preflight = None # verificação dos números em andamento antes da campanha
+        self.preflight_campaign = None # (conectores, contatos) que a campanha usa quando a verificação terminar
+        self.preflight_after_id = None
+        self.preflight_missing = set() # N dos contatos sem WhatsApp na campanha atual
+        self.preflight_results = queue.Queue()
+        self.preflight_check = True
+        self.campaign_sharding = CampaignLane.ROUND_ROBIN
+        self.profile_weights = {}
+        self.profile_intervals = {}
+        self.send_pacers = {} # perfil -> SendPacer, mantido entre campanhas
+        self.send_caps = {"hourly": 0, "daily": 0} # 0 = sem limite
+        self.profile_caps = {}
+        self.http_pool_size = WhatsAppConnector.DEFAULT_POOL_SIZE
+        self.http_timeouts = {}
+        self.http_backend = "requests"
+
+    def _apply_campaign_config(self, state):
+        """Aplica as chaves do config.json que valem para a campanha (as mesmas no App e na linha de comando)."""
+        self.http_pool_size = state.get("http_pool_size", WhatsAppConnector.DEFAULT_POOL_SIZE)
+        self.http_timeouts = state.get("http_timeouts", {})
+        self.http_backend = state.get("http_backend", "requests")
+        self.campaign_sharding = state.get("campaign_sharding", CampaignLane.ROUND_ROBIN)
+        self.profile_weights = state.get("profile_weights", {})
+        self.profile_intervals = state.get("profile_intervals", {})
+        self.send_history.cooldown = state.get("send_cooldown_hours", 24) * 3600
+        self.preflight_check = state.get("preflight_check", True)
+        self.number_check_cache.ttl = state.get("number_check_ttl_hours", 168) * 3600
+        self.send_caps = state.get("send_caps", self.send_caps)
+        self.profile_caps = state.get("profile_caps", {})
+
+    def _campaign_config(self):
+        """As mesmas chaves, para o App gravar no config.json."""
+        return {
+            "http_pool_size": self.http_pool_size,
+            "http_timeouts": self.http_timeouts,
+            "http_backend": self.http_backend,
+            "campaign_sharding": self.campaign_sharding,
+            "profile_weights": self.profile_weights,
+            "profile_intervals": self.profile_intervals,
+            "send_cooldown_hours": self.send_history.cooldown / 3600,
+            "preflight_check": self.preflight_check,
+            "number_check_ttl_hours": self.number_check_cache.ttl / 3600,
+            "send_caps": self.send_caps,
+            "profile_caps": self.profile_caps,
+        }
+
+    def _new_connector(self, profile_name):
+        """Conector do perfil com o pool, os timeouts e o backend HTTP configurados."""
+        connector_class = WhatsAppConnector
+        if self.http_backend == "async":
+            if aiohttp: connector_class = AsyncWhatsAppConnector
+            else: print("http_backend 'async' requer o pacote aiohttp; usando o conector padrão.")
+        return connector_class(session_name=profile_name, pool_size=self.http_pool_size, timeouts=self.http_timeouts)
+
+    # --- Ganchos de exibição: o App mostra na janela, o modo sem interface só no console ---
+    def _refresh_contact(self, contact_number): pass
+    def _show_countdown(self, lane, contact_number, seconds): pass
+    def _clear_countdown(self, lane): pass
+    def _follow_contact(self, lane, contact_number): pass
+    def _highlight_sent(self, contact_number): pass
+    def _show_send_result(self, contact_number, outcome): pass
+    def _on_comment_changed(self, contact_number, comment): pass
+    def _on_message_sent(self, phone): pass
+    def _on_campaign_state(self, running): pass
+
+    def _on_campaign_progress(self, text):
+        if text: print(text)
+
+    def _on_campaign_halted(self, message):
+        print(message)
+
+    def _on_campaign_finished(self):
+        print("Todos os contatos foram processados!")
+
+    def _default_interval(self):
+        return 20, 45
+
+    # --- Lista ---
+    def _build_contact(self, n, row):
+        return Contact(n, row[0] if len(row) > 0 else "", row[2] if len(row) > 2 else "",
+                       row[3] if len(row) > 3 else "", extra=tuple(row[Contact.CORE_COLUMNS:]))
+
+    def _restore_campaign_progress(self):
+        """Reaplica à lista o resultado dos envios registrados no checkpoint da campanha; retorna o estado lido."""
+        if not self.campaign_checkpoint or not (state := self.campaign_checkpoint.state()): return None
+        for n, send_state in state.contacts.items():
+            if not self.contact_store.get(n): continue
+            if send_state == CampaignCheckpoint.SENDING:
+                self.contact_store.set_field(n, "status_envio", "? Verificar")
+            elif send_state == CampaignCheckpoint.RETRY:
+                self.contact_store.set_field(n, "status_envio", "↻ Repetir")
+            else:
+                success = send_state == CampaignCheckpoint.SENT
+                self.contact_store.set_field(n, "disparo", "Sucesso" if success else "Falhou")
+                self.contact_store.set_field(n, "status_envio", "✓ Sucesso" if success else "✗ Falhou")
+                self._show_send_result(n, "success" if success else "failed")
+            self._refresh_contact(n)
+        return state
+
+    # --- Templates ---
+    @staticmethod
+    def _read_templates(filepaths):
+        """Compila os arquivos de template: (templates, caminhos carregados, arquivos que falharam)."""
+        loaded_templates, loaded_paths, failed_files = [], [], []
+        for path in filepaths:
+            if not os.path.exists(path): failed_files.append(os.path.basename(path)); continue
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    loaded_templates.append(MessageTemplate(file.read(), os.path.basename(path))); loaded_paths.append(path)
+            except Exception: failed_files.append(os.path.basename(path))
+        return loaded_templates, loaded_paths, failed_files
+
+    def _pick_template(self):
+        """Sorteia um template compilado; `name` é o arquivo, guardado no histórico de envios."""
+        return random.choice(self.message_templates)
+
+    def _template_values(self, contact, fields):
+        """Valores dos campos usados pelos templates: os fixos abaixo ou qualquer coluna do cabeçalho da lista."""
+        columns, values = self.list_columns, {}
+        for key in fields:
+            if key == "nome": value = self._processar_nome(contact.nome)
+            elif key == "nome completo": value = contact.nome
+            elif key == "telefone": value = contact.telefone
+            elif key == "n": value = contact.numero
+            elif key in columns: value = contact.column(columns[key])
+            else: continue
+            values[key] = MessageTemplate.filter_bmp(value)
+        return values
+
+    def _render_messages(self, contact_numbers):
+        """Pré-renderiza as mensagens de vários contatos: [(contato, template, texto)]."""
+        contacts = [c for n in contact_numbers if (c := self.contact_store.get(n))]
+        return MessageTemplate.render_batch(self.message_templates, contacts, self._template_values)
+
+    def _forget_rendered(self, contact_number):
+        """Descarta a mensagem pré-renderizada de um contato editado durante a campanha."""
+        for lane in self.campaign_lanes.values(): lane.messages.pop(contact_number, None)
+
+    @staticmethod
+    def _describe_send(recent):
+        sent_at, template, profile = recent
+        details = ", ".join(filter(None, [template, f"perfil {profile}" if profile else ""]))
+        return f"em {sent_at.strftime('%d/%m/%Y %H:%M')}" + (f" ({details})" if details else "")
+
+    def _processar_nome(self, nome_completo):
+        if not isinstance(nome_completo, str) or not nome_completo.strip(): return ""
+        palavras = nome_completo.split()
+        return palavras[1] if palavras[0].lower() in ['doutor', 'dr.'] and len(palavras) > 1 else palavras[0]
+
+    # --- Gravação: status no CSV, comentários, tentativas de envio ---
+    def _set_status_envio(self, contact_number, text):
+        if self.contact_store.set_field(contact_number, "status_envio", text):
+            self._refresh_contact(contact_number)
+
+    def _update_disparo_status(self, contact_number, new_disparo_status):
+        self.contact_store.set_field(contact_number, "disparo", new_disparo_status)
+        self._refresh_contact(contact_number)
+
+    def _save_edit_to_csv(self, contact_number, column_index, new_value):
+        try:
+            if self.database:
+                return self.database.update_field(self.current_filepath, contact_number, column_index, new_value)
+            if not self.csv_journal: return False
+            self.csv_journal.record_edit(contact_number, column_index, new_value)
+            return True
+        except Exception as e: print(f"ERRO ao editar CSV: {e}"); return False
+
+    def _save_status_to_csv(self, contact_number, new_status):
+        return self._save_edit_to_csv(contact_number, 3, new_status)
+
+    def _sync_list_file(self, filepath=None, journal=None):
+        """Leva ao CSV as edições pendentes (journal ou banco)."""
+        filepath, journal = filepath or self.current_filepath, journal or self.csv_journal
+        if not filepath: return
+        if self.database:
+            if self.database.is_dirty(filepath): self.database.export_list(filepath)
+        elif journal:
+            journal.compact()
+
+    def _add_comment_to_contact(self, contact_number, telefone_id, comment_line):
+        try:
+            self._on_comment_changed(contact_number, self.comments.append_line(telefone_id, comment_line))
+        except Exception as e:
+            print(f"Erro ao adicionar comentário: {e}")
+
+    def _record_send_attempt(self, contact_number, telefone_id, connector, success, message):
+        if not self.database: return
+        try: self.database.record_send(self.current_filepath, contact_number, telefone_id, connector.session_name, success, message)
+        except sqlite3.Error as e: print(f"Erro ao registrar envio: {e}")
+
+    def _add_campaign_sent_comment(self, contact_number, telefone_id):
+        timestamp = datetime.now().strftime("%d de %B, %H:%M de %Y")
+        campaign_text = f"{timestamp} - Campanha enviada"
+        self._add_comment_to_contact(contact_number, telefone_id, campaign_text)
+
+    def _add_contact_not_found_comment(self, contact_number, telefone_id, nome_completo):
+        timestamp = datetime.now().strftime("%d de %B, %H:%M de %Y")
+        comment_text = f"{timestamp} - Contato não encontrado no WhatsApp"
+        self._add_comment_to_contact(contact_number, telefone_id, comment_text)
+        self.contact_store.set_field(contact_number, "status", "Não encontrado")
+        self._refresh_contact(contact_number)
+        if not self._save_status_to_csv(contact_number, "Não encontrado"):
+            print(f"Erro ao salvar status 'Não encontrado' do contato {contact_number:03d}")
+
+    def _send_report_text(self):
+        """Texto do relatório de disparos da lista, ou None se nada foi enviado."""
+        timestamp = datetime.now().strftime("%d de %B de %Y, %H:%M:%S")
+        processed_contacts = [c for c in self.contact_store if c.disparo]
+        if not processed_contacts: return None
+        success = [c for c in processed_contacts if c.disparo == "Sucesso"]
+        failed = [c for c in processed_contacts if c.disparo == "Falhou"]
+        content = [f"Relatório de Disparos - {timestamp}", "="*50, "Resumo:",
+                   f"  - Envios Tentados: {len(processed_contacts)}", f"  - Sucessos: {len(success)}",
+                   f"  - Falhas: {len(failed)}", "\n" + "="*50 + "\n"]
+        if success:
+            content.append("ENVIOS COM SUCESSO:"); content.extend([f"  - [{c.numero}] {c.nome} - {c.telefone}" for c in success]); content.append("\n")
+        if failed:
+            content.append("ENVIOS QUE FALHARAM:"); content.extend([f"  - [{c.numero}] {c.nome} - {c.telefone}" for c in failed]); content.append("\n")
+        return "\n".join(content)
+
+    # --- Campanha ---
+    def _checkpoint(self, method, *args):
+        """Grava um evento no checkpoint da campanha; uma falha de disco não interrompe o envio."""
+        if not self.campaign_checkpoint: return
+        try: getattr(self.campaign_checkpoint, method)(*args)
+        except OSError as e: print(f"Erro ao gravar checkpoint da campanha: {e}")
+
+    def _resume_pending(self, state):
+        """N dos contatos que a campanha interrompida ainda não processou (inclui os marcados para nova tentativa)."""
+        start_index = max(self.contact_store.index_of(state.start_n), 0)
+        return [c.n for c in self.contact_store.contacts[start_index:]
+                if state.contacts.get(c.n, CampaignCheckpoint.RETRY) == CampaignCheckpoint.RETRY
+                and c.telefone_id not in state.sent_phones]
+
+    def _launch_campaign(self, connectors, contact_numbers):
+        # Números inválidos ou repetidos na lista ficam fora da fila, com o motivo na coluna de status.
+        valid = []
+        for n in contact_numbers:
+            contact = self.contact_store.get(n)
+            if contact and contact.phone_issue: self._set_status_envio(n, f"✗ {contact.phone_issue}")
+            else: valid.append(n)
+        if len(valid) < len(contact_numbers):
+            print(f"{len(contact_numbers) - len(valid)} contatos com telefone inválido ou duplicado ficaram fora da campanha")
+        self.auto_send_running = True
+        self.auto_send_stop_requested = False
+        self.campaign_id += 1
+        self._on_campaign_state(True)
+        self._run_number_preflight(connectors, valid)
+
+    def _run_number_preflight(self, connectors, contact_numbers):
+        """Verifica no WhatsApp os números ainda sem resultado no cache; a campanha começa quando terminar."""
+        unchecked, self.preflight_missing = set(), set()
+        if not self.preflight_check:
+            self._start_campaign_lanes(connectors, contact_numbers); return
+        for n in contact_numbers:
+            contact = self.contact_store.get(n)
+            if not contact: continue
+            exists = self.number_check_cache.get(contact.phone_key)
+            if exists is False: self._mark_number_missing(contact)
+            elif exists is None: unchecked.add(contact.phone_key)
+        if not unchecked:
+            self._start_campaign_lanes(connectors, contact_numbers); return
+        self.number_preflight = NumberPreflight(connectors, sorted(unchecked), self.number_check_cache, self.preflight_results)
+        self.preflight_campaign = (connectors, contact_numbers)
+        self.number_preflight.start()
+        self._on_campaign_progress(f"Verificando {len(unchecked)} números...")
+        self._poll_number_preflight()
+
+    def _poll_number_preflight(self):
+        self.preflight_after_id = None
+        if not (preflight := self.number_preflight): return
+        missing, finished = set(), False
+        while True:
+            try: owner, phone_key, exists = self.preflight_results.get_nowait()
+            except queue.Empty: break
+            if owner is not preflight: continue # verificação de uma campanha já interrompida
+            if phone_key is None: finished = True
+            elif exists is False: missing.add(phone_key)
+        connectors, contact_numbers = self.preflight_campaign
+        if missing:
+            for n in contact_numbers:
+                if (contact := self.contact_store.get(n)) and contact.phone_key in missing: self._mark_number_missing(contact)
+        if not finished:
+            self._on_campaign_progress(f"Verificando números ({preflight.checked}/{preflight.total})...")
+            self.preflight_after_id = self.after(100, self._poll_number_preflight); return
+        self.number_preflight = self.preflight_campaign = None
+        self._on_campaign_progress(None)
+        self._start_campaign_lanes(connectors, contact_numbers)
+
+    def _mark_number_missing(self, contact):
+        """Contato sem WhatsApp segundo a verificação prévia: sai da campanha sem gastar um envio."""
+        if contact.n in self.preflight_missing: return
+        self.preflight_missing.add(contact.n)
+        if contact.status != "Não encontrado":
+            self._add_contact_not_found_comment(contact.n, contact.telefone_id, contact.nome)
+        self._checkpoint("record", contact.n, contact.telefone_id, CampaignCheckpoint.FAILED, None)
+        self._set_status_envio(contact.n, "✗ Sem WhatsApp")
+
+    def _start_campaign_lanes(self, connectors, contact_numbers):
+        if not self.auto_send_running: return
+        contact_numbers = [n for n in contact_numbers if n not in self.preflight_missing]
+        self.campaign_lanes = self._build_campaign_lanes(connectors, contact_numbers)
+        # Mensagens da campanha inteira renderizadas de uma vez; cada perfil guarda as dos seus contatos.
+        rendered = {contact.n: (template, text) for contact, template, text in self._render_messages(contact_numbers)}
+        for lane in self.campaign_lanes.values():
+            lane.messages = {n: rendered[n] for n in lane.pending if n in rendered}
+        if len(self.campaign_lanes) > 1:
+            self._on_campaign_progress(f"Enviando por {len(self.campaign_lanes)} perfis")
+        for lane in self.campaign_lanes.values():
+            self._ensure_campaign_worker(lane.profile)
+            self._start_auto_send(lane)
+
+    def _build_campaign_lanes(self, connectors, contact_numbers):
+        """Divide os contatos entre os perfis conectados (rodízio ou por peso)."""
+        weighted = self.campaign_sharding == CampaignLane.WEIGHTED
+        weights = {}
+        for connector in connectors:
+            weight = self.profile_weights.get(connector.session_name, 1) if weighted else 1
+            if weight > 0: weights[connector.session_name] = weight
+        if not weights: weights = {c.session_name: 1 for c in connectors}
+        shards = CampaignLane.shard(contact_numbers, weights)
+        lanes = {}
+        for connector in connectors:
+            if connector.session_name not in weights: continue
+            interval = self.profile_intervals.get(connector.session_name)
+            lanes[connector.session_name] = lane = CampaignLane(connector.session_name, connector, shards[connector.session_name],
+                                                                tuple(interval) if interval else None, weights[connector.session_name])
+            lane.pacer = self._send_pacer(connector.session_name)
+        return lanes
+
+    def _send_pacer(self, profile):
+        """SendPacer do perfil com os limites configurados; o primeiro é semeado com os envios das últimas 24h."""
+        if not (pacer := self.send_pacers.get(profile)):
+            sent_times = self.send_history.sends_since(profile, time.time() - 86400)
+            pacer = self.send_pacers[profile] = SendPacer(sent_times=sent_times)
+        caps = {**self.send_caps, **self.profile_caps.get(profile, {})}
+        pacer.hourly_cap, pacer.daily_cap = int(caps.get("hourly") or 0), int(caps.get("daily") or 0)
+        return pacer
+
+    def _ensure_campaign_worker(self, profile):
+        """Garante o worker de envio do perfil vivo e o escoamento periódico dos resultados."""
+        worker = self.campaign_workers.get(profile)
+        if not worker or not worker.is_alive():
+            worker = self.campaign_workers[profile] = CampaignWorker(self.campaign_results)
+            worker.start()
+        if not self.campaign_poll_id:
+            self._poll_campaign_results()
+
+    def _poll_campaign_results(self):
+        while True:
+            try: result = self.campaign_results.get_nowait()
+            except queue.Empty: break
+            self._on_auto_send_result(result)
+        self.campaign_poll_id = self.after(100, self._poll_campaign_results)
+
+    def _cancel_lane(self, lane):
+        if lane.after_id:
+            self.after_cancel(lane.after_id)
+            lane.after_id = None
+        self._clear_countdown(lane)
+
+    def _stop_auto_send(self, finished=False):
+        if self.number_preflight:
+            self.number_preflight.cancel()
+            self.number_preflight = self.preflight_campaign = None
+            if self.preflight_after_id: self.after_cancel(self.preflight_after_id); self.preflight_after_id = None
+        for lane in self.campaign_lanes.values(): self._cancel_lane(lane)
+        if self.campaign_lanes: self._checkpoint("finish" if finished else "stop")
+        self.campaign_lanes = {}
+
+        self.auto_send_stop_requested = True
+        self.auto_send_running = False
+        self._on_campaign_state(False)
+        print("Envio automático concluído" if finished else "Envio automático interrompido pelo usuário")
+
+    def _retire_lane(self, lane):
+        """Tira da campanha um perfil que desconectou, repassando seus contatos aos demais."""
+        self._cancel_lane(lane)
+        self.campaign_lanes.pop(lane.profile, None)
+        if not self.campaign_lanes: return False
+        remaining = lane.drain()
+        shards = CampaignLane.shard(remaining, {p: l.weight for p, l in self.campaign_lanes.items()})
+        for profile, contact_numbers in shards.items():
+            other = self.campaign_lanes[profile]
+            other.pending.extend(contact_numbers)
+            other.messages.update((n, lane.messages[n]) for n in contact_numbers if n in lane.messages)
+            if other.done and contact_numbers:
+                other.done = False; self._start_auto_send(other)
+        print(f"Perfil {lane.profile} desconectado; {len(remaining)} contatos repassados aos outros perfis")
+        return True
+
+    def _start_auto_send(self, lane):
+        lane.after_id = None
+        if not self.auto_send_running or self.auto_send_stop_requested: return
+
+        if not lane.has_work():
+            lane.done = True
+            if all(l.done for l in self.campaign_lanes.values()):
+                self._stop_auto_send(finished=True)
+                self._on_campaign_finished()
+            return
+
+        # Pausa por sinal de bloqueio ou limite por hora/dia, ou só restam novas tentativas ainda não vencidas.
+        if (wait := lane.pacer.wait() if lane.pacer else 0) > 0:
+            print(f"Perfil {lane.profile} em pausa (bloqueio ou limite de envios); retoma em {wait / 60:.0f} min")
+        elif (wait := lane.retry_wait()) > 0:
+            print(f"Perfil {lane.profile}: próxima nova tentativa em {wait:.0f} segundos")
+        if wait > 0:
+            self._show_countdown(lane, lane.peek(), round(wait))
+            # Arredonda para cima: disparado antes da hora, o agendamento se repetiria até vencer.
+            lane.after_id = self.after(int(wait * 1000) + 1, self._start_auto_send, lane)
+            return
+
+        lane.current = lane.take()
+        self._follow_contact(lane, lane.current)
+        lane.after_id = self.after(1000, self._send_auto_message, lane)
+
+    def _send_auto_message(self, lane):
+        lane.after_id = None
+        if self.auto_send_stop_requested: return
+
+        contact_number, lane.current = lane.current, None
+        full_contact_data = self.contact_store.get(contact_number)
+
+        # Telefone que já recebeu a campanha dentro do cooldown (nesta ou em outra lista): pula.
+        if full_contact_data and (recent := self.send_history.recent(full_contact_data.telefone_id)):
+            print(f"Pulando {full_contact_data.nome}: campanha já enviada {self._describe_send(recent)}")
+            self._set_status_envio(contact_number, f"↷ Enviado {recent[0].strftime('%d/%m %H:%M')}")
+            lane.after_id = self.after(100, self._start_auto_send, lane)
+            return
+
+        if not full_contact_data:
+            lane.after_id = self.after(100, self._start_auto_send, lane)
+            return
+        self._highlight_sent(contact_number)
+
+        if not lane.connector.is_connected:
+            lane.pending.appendleft(contact_number)
+            if not self._retire_lane(lane):
+                self._stop_auto_send()
+                self._on_campaign_halted("O envio foi interrompido (WhatsApp desconectado).")
+            return
+
+        # Texto pré-renderizado em _start_campaign_lanes; renderiza aqui se o contato foi editado depois.
+        if not (rendered := lane.messages.get(contact_number)):
+            template = self._pick_template()
+            rendered = lane.messages[contact_number] = (template, template.render(self._template_values(full_contact_data, template.fields)))
+        template, mensagem_filtrada = rendered
+        template_name = template.name
+        nome_completo, numero_telefone = full_contact_data.nome, full_contact_data.telefone_id
+
+        # O envio acontece no worker do perfil; o resultado volta por _poll_campaign_results.
+        lane.attempts[contact_number] = lane.attempts.get(contact_number, 0) + 1
+        self._checkpoint("record", contact_number, numero_telefone, CampaignCheckpoint.SENDING, lane.profile)
+        self._set_status_envio(contact_number, "Enviando...")
+        self.campaign_workers[lane.profile].submit(SimpleNamespace(
+            campaign_id=self.campaign_id, contact_number=contact_number,
+            nome=nome_completo, phone=numero_telefone, message=mensagem_filtrada,
+            template=template_name, connector=lane.connector, profile=lane.profile, dispatched_at=time.monotonic()))
+
+    def _campaign_interval(self, lane):
+        """Intervalo (min, max) do perfil, ou o padrão da campanha quando o perfil não define um."""
+        return lane.interval or self._default_interval()
+
+    def _on_auto_send_result(self, result):
+        job, success, message = result.job, result.success, result.message
+        kind = None if success else getattr(message, "kind", SendFailure.PERMANENT)
+        # Lane da campanha em andamento; None para resultados de uma campanha anterior (STOP durante o envio).
+        lane = None
+        if job.campaign_id == self.campaign_id and self.auto_send_running:
+            lane = self.campaign_lanes.get(job.profile)
+        # Falha transitória volta para a fila do perfil com backoff, até esgotar as tentativas.
+        retry_in = lane.schedule_retry(job.contact_number) if lane and kind == SendFailure.TRANSIENT else False
+
+        state = CampaignCheckpoint.SENT if success else CampaignCheckpoint.RETRY if retry_in else CampaignCheckpoint.FAILED
+        self._checkpoint("record", job.contact_number, job.phone, state, job.profile)
+        self._record_send_attempt(job.contact_number, job.phone, job.connector, success, message)
+        self._send_pacer(job.profile).observe(success, result.latency, message)
+
+        if retry_in:
+            print(f"Falha transitória ao enviar para {job.nome} ({job.profile}): {message}. Nova tentativa em {retry_in:.0f}s")
+            self._show_send_result(job.contact_number, "retry")
+            self._set_status_envio(job.contact_number, f"↻ Tentativa {lane.attempts[job.contact_number] + 1}")
+        else:
+            disparo_status = "Sucesso" if success else "Falhou"
+            self._update_disparo_status(job.contact_number, disparo_status)
+
+            if success:
+                self.send_history.record(job.phone, job.template, job.profile)
+                self._on_message_sent(job.phone)
+                self._add_campaign_sent_comment(job.contact_number, job.phone)
+                print(f"Mensagem enviada com sucesso para {job.nome} ({job.profile})")
+            else:
+                print(f"Erro ao enviar para {job.nome} ({job.profile}): {message}")
+                if kind == SendFailure.INVALID_NUMBER:
+                    self._add_contact_not_found_comment(job.contact_number, job.phone, job.nome)
+            self._show_send_result(job.contact_number, "success" if success else "failed")
+            self._set_status_envio(job.contact_number, "✓ Sucesso" if success else "✗ Falhou")
+
+        if not lane: return
+
+        if lane.has_work() and not self.auto_send_stop_requested:
+            # Intervalo adaptativo: erros e lentidão aproximam do máximo, envios saudáveis do mínimo.
+            intervalo = lane.pacer.interval(*self._campaign_interval(lane))
+
+            # O intervalo conta a partir do disparo, descontando a latência do envio.
+            espera = max(0.0, job.dispatched_at + intervalo - time.monotonic())
+            print(f"Próximo envio de {lane.profile} em {espera:.0f} segundos...")
+            self._show_countdown(lane, lane.peek(), round(espera))
+            lane.after_id = self.after(int(espera * 1000), self._start_auto_send, lane)
+        else:
+            if not self.auto_send_stop_requested: self._start_auto_send(lane)
+            else: self._stop_auto_send()
+
 # ===================================================================
 # CLASSE PRINCIPAL DA APLICAÇÃO (HUBY_APP)
 # ===================================================================
-class App(tk.Tk):
+class App(tk.Tk, CampaignEngine):
+    LIST_LOAD_SLICE = 0.012 # segundos de lotes aplicados por tick; o resto espera o próximo para a janela repintar
+
     def __init__(self):
         super().__init__()
         script_dir = os.path.dirname(os.path.realpath(__file__))
         self.config_filepath = os.path.join(script_dir, "config.json")
         self.comments_filepath = os.path.join(script_dir, "comentarios.json")
+        self.database_filepath = os.path.join(script_dir, "huby.db")
+        self.database = None
+        self.send_history = SendHistory(os.path.join(script_dir, "historico_envios.log"))
+        self.send_history.load()
+        self.number_check_cache = NumberCheckCache(os.path.join(script_dir, "verificacao_numeros.log"))
+        self.number_check_cache.load()
         try:
             locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
         except locale.Error:
@@ -230,24 +2690,37 @@ class App(tk.Tk):
         self.whatsapp_connectors = {}
         self.profile_names = []
         self.active_profile_name = tk.StringVar()
+        self.connection_monitors = {}
+        self.connection_status_results = queue.Queue()
         
         self.current_filepath = None
+        self.csv_journal = None
+        self.list_loader = None
+        self.list_load_results = queue.Queue()
+        self.list_load_after_id = None
+        self.list_loaded_callback = None
         self.nome_var = tk.StringVar()
         self.telefone_var = tk.StringVar()
         self.search_var = tk.StringVar()
         self.min_interval_var = tk.StringVar(value="20")
         self.max_interval_var = tk.StringVar(value="45")
         
-        self.all_contacts = []
-        self.comments = {}
+        self.contact_store = ContactStore()
+        self.search_index = ContactSearchIndex(self.contact_store)
+        self.sort_index = ContactSortIndex(self.contact_store)
+        self.sort_state = None # (coluna, reverse) da última ordenação aplicada
+        self.search_after_id = None
+        self.comments = CommentStore(self.comments_filepath)
+        self.comments.load()
         self.after_id = None
         self.original_edit_value = None
         self.message_templates = []
         self.message_templates_paths = []
-        self.auto_send_running = False
-        self.auto_send_stop_requested = False
-        self.current_auto_index = 0
-        self.countdown_after_id = None
+        self.phone_normalizer = PhoneNormalizer()
+        self.phone_memos = {} # por arquivo: telefone do CSV -> (chave, problema), reaproveitado ao recarregar
+        self.list_columns = {} # coluna do cabeçalho (normalizada) -> índice, para os campos dos templates
+        self._init_campaign_state()
+        self.parallel_send_var = tk.BooleanVar(value=False)
         
         self.custom_message_panel = None
         self.custom_message_text_widget = None
@@ -255,6 +2728,11 @@ class App(tk.Tk):
         
         # --- WIDGET DO HISTÓRICO DE CHAT ---
         self.chat_history_text = None
+        self.chat_history_results = queue.Queue()
+        self.chat_fetcher = ChatHistoryFetcher(self.chat_history_results)
+        self.chat_history_key = None # (perfil, telefone) da conversa que o painel deve exibir
+        self.chat_fetch_after_id = None
+        self.chat_poll_id = None
 
         self.wpp_button = None
 
@@ -271,37 +2749,53 @@ class App(tk.Tk):
         self._create_context_menu()
         self.bind("<Alt-w>", self._send_whatsapp_message)
         self.protocol("WM_DELETE_WINDOW", self._on_closing)
-        self._load_state()
-        
-        self._update_profile_menu()
-        self.active_profile_name.trace_add("write", self._on_profile_change)
-        
+
         # --- CONFIGURAÇÃO DO DESTAQUE DE ÚLTIMO ENVIO ---
+        # (antes de _load_state, que restaura o último envio da lista anterior)
         self.tree.tag_configure('last_sent', background='#d8e8ff') # Um azul bem claro
         self.tree.tag_configure('success', background='#d9f7d9')   # Verde claro
         self.tree.tag_configure('failed', background='#ffdddd')    # Vermelho claro
-        self.last_sent_item_id = None # Armazena o ID do item na Treeview
+        self.last_sent_item_id = None # N do contato destacado como último envio
         self.last_sent_contact_n = None # Armazena o número (N) do contato para persistência
-        self.countdown_item_id = None # ID do item para o qual o countdown está rodando
 
-        self._check_connection_periodically()
+        self._load_state()
+        
+        self._update_profile_menu()
+        self.active_profile_name.trace_add("write", self._on_profile_change)
+
+        self._poll_connection_status()
+
+    @property
+    def all_contacts(self):
+        return self.contact_store.contacts
+
+    def _create_connector(self, profile_name):
+        """Cria o conector do perfil com o pool e timeouts configurados e inicia seu monitor de conexão."""
+        connector = self._new_connector(profile_name)
+        monitor = self.connection_monitors[profile_name] = ConnectionMonitor(connector, self.connection_status_results)
+        monitor.start()
+        return connector
+
+    def _close_connector(self, profile_name):
+        if monitor := self.connection_monitors.pop(profile_name, None): monitor.stop()
+        if connector := self.whatsapp_connectors.pop(profile_name, None): connector.close()
 
     def _get_active_connector(self):
         """Retorna a instância do conector para o perfil ativo."""
         profile_name = self.active_profile_name.get()
         return self.whatsapp_connectors.get(profile_name)
 
-    def _check_connection_periodically(self):
-        def check():
-            connector = self._get_active_connector()
-            if connector:
-                old_status = connector.is_connected
-                new_status = connector.check_connection_status()
-                if old_status != new_status:
-                    self._update_connection_button()
-        
-        threading.Thread(target=check, daemon=True).start()
-        self.after(5000, self._check_connection_periodically)
+    def _poll_connection_status(self):
+        """Aplica na interface as mudanças de conexão publicadas pelos monitores dos perfis."""
+        while True:
+            try: profile_name, connected = self.connection_status_results.get_nowait()
+            except queue.Empty: break
+            print(f"Perfil {profile_name}: {'conectado' if connected else 'desconectado'}")
+            if profile_name == self.active_profile_name.get(): self._update_connection_button()
+        self.after(500, self._poll_connection_status)
+
+    def _wake_connection_monitor(self, fast=False):
+        if monitor := self.connection_monitors.get(self.active_profile_name.get()): monitor.wake(fast=fast)
 
     def _update_connection_button(self):
         connector = self._get_active_connector()
@@ -330,17 +2824,11 @@ class App(tk.Tk):
         else:
             success, message = connector.start_session()
             if success:
-                self.after(2000, self._check_connection_and_update)
+                self._update_connection_button()
+                self._wake_connection_monitor(fast=True)
             else:
                 messagebox.showerror("Erro", message)
 
-    def _check_connection_and_update(self):
-        connector = self._get_active_connector()
-        if connector and connector.check_connection_status():
-            self._update_connection_button()
-        else:
-            self.after(3000, self._check_connection_and_update)
-
     def _create_load_action_frame(self, parent):
         load_action_frame = tk.Frame(parent, bg="#F0F0F0")
         load_action_frame.pack(fill="x", pady=3)
@@ -376,6 +2864,9 @@ class App(tk.Tk):
         self.start_button = tk.Button(action_buttons_frame, text="START", width=6, command=self._toggle_auto_send, bg="#ccffcc")
         self.start_button.pack(side="left", padx=(0, 5))
         Tooltip(self.start_button, "Iniciar ou parar o envio automático")
+        parallel_check = tk.Checkbutton(action_buttons_frame, text="Todos", variable=self.parallel_send_var, bg="#F0F0F0")
+        parallel_check.pack(side="left", padx=(0, 5))
+        Tooltip(parallel_check, "Dividir a campanha entre todos os perfis conectados,\ncada um com seu próprio intervalo")
         self.connect_button = tk.Button(action_buttons_frame, text="Conectar", width=10, command=self._toggle_whatsapp_connection, bg="#ccffcc")
         self.connect_button.pack(side="left", padx=(0, 5))
         Tooltip(self.connect_button, "Conectar/Desconectar do WhatsApp.\nDesconectar limpa a sessão atual.")
@@ -421,7 +2912,7 @@ class App(tk.Tk):
                 messagebox.showwarning("Perfil Existente", "Um perfil com este nome já existe.")
                 return
             
-            self.whatsapp_connectors[profile_name] = WhatsAppConnector(session_name=profile_name)
+            self.whatsapp_connectors[profile_name] = self._create_connector(profile_name)
             self.profile_names.append(profile_name)
             self._update_profile_menu()
             self.active_profile_name.set(profile_name)
@@ -435,7 +2926,7 @@ class App(tk.Tk):
 
         profile_name = connector.session_name
         if messagebox.askyesno("Confirmar Remoção", f"Tem certeza que deseja remover o perfil '{profile_name}'?"):
-            del self.whatsapp_connectors[profile_name]
+            self._close_connector(profile_name)
             self.profile_names.remove(profile_name)
             self._update_profile_menu()
             if self.profile_names:
@@ -456,11 +2947,8 @@ class App(tk.Tk):
              self.active_profile_name.set(options[0])
 
     def _on_profile_change(self, *args):
-        connector = self._get_active_connector()
-        if connector:
-            threading.Thread(target=self._check_connection_and_update, daemon=True).start()
-        else:
-            self._update_connection_button()
+        self._update_connection_button()
+        self._wake_connection_monitor()
 
     def _toggle_custom_message_panel(self):
         if self.is_custom_message_panel_visible:
@@ -494,22 +2982,25 @@ class App(tk.Tk):
             messagebox.showwarning("Mensagem Vazia", "Por favor, digite uma mensagem para enviar.")
             return
 
-        selected_id, _, full_contact_data = self._get_selected_contact_info()
-        if not selected_id: return
+        contact_number, full_contact_data = self._get_selected_contact_info()
+        if not contact_number: return
         
         connector = self._get_active_connector()
         if not connector or not connector.is_connected:
             messagebox.showwarning("WhatsApp Desconectado", "Selecione um perfil e conecte ao WhatsApp antes de enviar.")
             return
 
-        _, nome_completo, _, _, numero_telefone, _, _, _ = full_contact_data
+        nome_completo, numero_telefone = full_contact_data.nome, full_contact_data.telefone_id
         mensagem_filtrada = self._filtrar_caracteres_bmp(message_content)
 
         success, message = connector.send_message(numero_telefone, mensagem_filtrada)
+        self._record_send_attempt(contact_number, numero_telefone, connector, success, message)
 
         if success:
             self._show_temporary_tooltip(self.custom_message_text_widget, f"Mensagem enviada para {nome_completo}!")
             self.custom_message_text_widget.delete("1.0", tk.END)
+            self.chat_fetcher.invalidate(PhoneNormalizer.e164(numero_telefone))
+            self._show_chat_history(numero_telefone)
         else:
             messagebox.showerror("Falha no Envio", f"Não foi possível enviar para {nome_completo}.\nMotivo: {message}")
 
@@ -517,32 +3008,12 @@ class App(tk.Tk):
         self._send_custom_message()
         return "break"
     
-    def _add_comment_to_contact(self, contact_number, telefone_id, comment_line):
-        try:
-            existing_comment = self.comments.get(telefone_id, "").strip()
-            new_comment = f"{existing_comment}\n{comment_line}" if existing_comment else comment_line
-            self.comments[telefone_id] = new_comment
-            self._save_all_comments_to_file()
-            
-            if self.tree.selection() and self.tree.item(self.tree.selection()[0], 'values')[0] == contact_number:
-                self.comment_text.config(state="normal")
-                self.comment_text.delete("1.0", tk.END)
-                self.comment_text.insert(tk.END, new_comment)
-                self.comment_text.config(state="disabled")
-        except Exception as e:
-            print(f"Erro ao adicionar comentário: {e}")
-    
-    def _add_campaign_sent_comment(self, contact_number, telefone_id):
-        timestamp = datetime.now().strftime("%d de %B, %H:%M de %Y")
-        campaign_text = f"{timestamp} - Campanha enviada"
-        self._add_comment_to_contact(contact_number, telefone_id, campaign_text)
-    
     def _send_whatsapp_message(self, event=None):
         if self.auto_send_running:
             messagebox.showwarning("Modo Automático", "O envio automático está ativo. Use STOP para interromper primeiro.")
             return
-        selected_id, contact_number, full_contact_data = self._get_selected_contact_info()
-        if not selected_id: return
+        contact_number, full_contact_data = self._get_selected_contact_info()
+        if not contact_number: return
 
         connector = self._get_active_connector()
         if not connector or not connector.is_connected:
@@ -553,222 +3024,198 @@ class App(tk.Tk):
             self._load_message_templates()
             if not self.message_templates: return
         
-        template_aleatorio = random.choice(self.message_templates)
-        _, nome_completo, _, _, numero_telefone, _, _, _ = full_contact_data
-        nome_tratado = self._processar_nome(nome_completo)
-        mensagem_personalizada = template_aleatorio.replace("[nome]", nome_tratado)
-        mensagem_filtrada = self._filtrar_caracteres_bmp(mensagem_personalizada)
+        nome_completo, numero_telefone = full_contact_data.nome, full_contact_data.telefone_id
+        if full_contact_data.phone_issue and full_contact_data.phone_issue != PhoneNormalizer.DUPLICATE:
+            if not messagebox.askyesno("Telefone Inválido", f"O telefone de {nome_completo} parece inválido ({full_contact_data.phone_issue}).\n\nEnviar mesmo assim?"):
+                return
+        if recent := self.send_history.recent(numero_telefone):
+            if not messagebox.askyesno("Envio Recente", f"{nome_completo} já recebeu a campanha {self._describe_send(recent)}.\n\nEnviar novamente?"):
+                return
+
+        template = self._pick_template()
+        template_name = template.name
+        mensagem_filtrada = template.render(self._template_values(full_contact_data, template.fields))
         
         self.update_idletasks()
+        started = time.monotonic()
         success, message = connector.send_message(numero_telefone, mensagem_filtrada)
+        self._send_pacer(connector.session_name).observe(success, time.monotonic() - started, message)
+        self._record_send_attempt(contact_number, numero_telefone, connector, success, message)
         disparo_status = "Sucesso" if success else "Falhou"
         self._update_disparo_status(contact_number, disparo_status)
         
         if success:
+            self.send_history.record(numero_telefone, template_name, connector.session_name)
+            self.chat_fetcher.invalidate(PhoneNormalizer.e164(numero_telefone))
             self._add_campaign_sent_comment(contact_number, numero_telefone)
             self._show_temporary_tooltip(self.w_button, f"Mensagem enviada para {nome_completo}!")
         else:
+            if getattr(message, "kind", None) == SendFailure.INVALID_NUMBER:
+                self._add_contact_not_found_comment(contact_number, numero_telefone, nome_completo)
             messagebox.showerror("Falha no Envio", f"Não foi possível enviar para {nome_completo}.\nMotivo: {message}")
 
-    def _update_countdown_in_list(self, item_id, remaining_time):
+    def _update_countdown_in_list(self, lane, contact_number, remaining_time):
+        lane.countdown_after_id = None
         if not self.auto_send_running or self.auto_send_stop_requested:
             # Limpa o status se o envio for interrompido
-            if self.tree.exists(item_id):
-                self.tree.set(item_id, "status_envio", "")
+            self._set_status_envio(contact_number, "")
             return
 
-        self.countdown_item_id = item_id
+        lane.countdown_n = contact_number
         if remaining_time > 0:
-            if self.tree.exists(item_id):
-                self.tree.set(item_id, "status_envio", f"Em {remaining_time}s...")
-            self.countdown_after_id = self.after(1000, self._update_countdown_in_list, item_id, remaining_time - 1)
+            self._set_status_envio(contact_number, f"Em {remaining_time}s...")
+            lane.countdown_after_id = self.after(1000, self._update_countdown_in_list, lane, contact_number, remaining_time - 1)
         else:
-            if self.tree.exists(item_id):
-                self.tree.set(item_id, "status_envio", "Enviando...")
-            self.countdown_item_id = None
+            self._set_status_envio(contact_number, "Enviando...")
+            lane.countdown_n = None
+
+    # --- Ganchos do CampaignEngine: a campanha exibida na lista e na janela ---
+    def _refresh_contact(self, contact_number):
+        self.list_view.refresh_row(contact_number)
+
+    def _show_countdown(self, lane, contact_number, seconds):
+        if self.list_view.exists(contact_number): self._update_countdown_in_list(lane, contact_number, seconds)
+
+    def _clear_countdown(self, lane):
+        if lane.countdown_after_id:
+            self.after_cancel(lane.countdown_after_id)
+            lane.countdown_after_id = None
+        # Limpa a mensagem de contagem regressiva do próximo contato do perfil
+        if lane.countdown_n:
+            self._set_status_envio(lane.countdown_n, "")
+            lane.countdown_n = None
+
+    def _follow_contact(self, lane, contact_number):
+        # Com um único perfil a seleção acompanha o envio; em paralelo ela fica livre.
+        if len(self.campaign_lanes) == 1 and self.list_view.exists(contact_number):
+            self.list_view.select(contact_number, notify=False)
+            self.on_item_select(None)
+
+    def _highlight_sent(self, contact_number):
+        if self.last_sent_item_id:
+            # Pega as tags existentes, remove 'last_sent' e reaplica as outras
+            current_tags = [t for t in self.list_view.tags(self.last_sent_item_id) if t != 'last_sent']
+            self.list_view.set_tags(self.last_sent_item_id, current_tags)
+        self.last_sent_item_id = contact_number
+        self.last_sent_contact_n = contact_number
+
+    def _show_send_result(self, contact_number, outcome):
+        tags = {"success": ('success',), "failed": ('failed',)}.get(outcome, ())
+        # Aplica o destaque azul por cima da cor de status
+        if contact_number == self.last_sent_item_id: tags += ('last_sent',)
+        self.list_view.set_tags(contact_number, tags)
 
-    def _toggle_auto_send(self):
-        if not self.auto_send_running:
+    def _on_comment_changed(self, contact_number, comment):
+        if self.list_view.selection() and self.list_view.selection()[0] == contact_number:
+            self.comment_text.config(state="normal")
+            self.comment_text.delete("1.0", tk.END)
+            self.comment_text.insert(tk.END, comment)
+            self.comment_text.config(state="disabled")
+
+    def _on_message_sent(self, phone):
+        self.chat_fetcher.invalidate(PhoneNormalizer.e164(phone))
+
+    def _on_campaign_state(self, running):
+        if running: self.start_button.config(text="STOP", bg="#ffcccc")
+        else:
+            self.start_button.config(text="START", bg="#ccffcc")
+            self.title("Huby App - Gerenciador e Enviador")
+
+    def _on_campaign_progress(self, text):
+        self.title(f"Huby App - {text}" if text else "Huby App - Gerenciador e Enviador")
+
+    def _on_campaign_halted(self, message):
+        messagebox.showwarning("Envio Parado", message)
+
+    def _on_campaign_finished(self):
+        self._generate_send_report()
+        messagebox.showinfo("Concluído", "Todos os contatos foram processados!")
+
+    def _default_interval(self):
+        """Intervalo (min, max) dos campos da tela."""
+        try:
+            min_i = int(self.min_interval_var.get())
+            max_i = int(self.max_interval_var.get())
+            if min_i <= 0 or max_i < min_i: raise ValueError("Intervalo inválido")
+            return min_i, max_i
+        except (ValueError, tk.TclError):
+            messagebox.showwarning("Intervalo Inválido", "Intervalo inválido. Usando padrão (20-45s).")
+            self.min_interval_var.set("20"); self.max_interval_var.set("45")
+            return 20, 45
+    def _campaign_connectors(self):
+        """Conectores que participam da campanha, ou None (com aviso) se não houver como iniciar."""
+        if self.parallel_send_var.get():
+            connectors = [c for p in self.profile_names if (c := self.whatsapp_connectors.get(p)) and c.is_connected]
+        else:
             connector = self._get_active_connector()
-            if not connector or not connector.is_connected:
-                messagebox.showwarning("WhatsApp Desconectado", "Selecione um perfil e conecte ao WhatsApp primeiro.")
-                return
+            connectors = [connector] if connector and connector.is_connected else []
+        if not connectors:
+            messagebox.showwarning("WhatsApp Desconectado", "Selecione um perfil e conecte ao WhatsApp primeiro.")
+            return None
+
+        if not self.all_contacts:
+            messagebox.showwarning("Sem Contatos", "Carregue uma lista de contatos primeiro.")
+            return None
+        if self.list_loader:
+            messagebox.showwarning("Carregando Lista", "Aguarde o fim do carregamento da lista.")
+            return None
+        if not self.message_templates:
+            messagebox.showwarning("Sem Mensagens", "Carregue os templates de mensagem primeiro.")
+            return None
+        return connectors
 
-            if not self.all_contacts:
-                messagebox.showwarning("Sem Contatos", "Carregue uma lista de contatos primeiro.")
-                return
-            if not self.message_templates:
-                messagebox.showwarning("Sem Mensagens", "Carregue os templates de mensagem primeiro.")
-                return
+    def _toggle_auto_send(self):
+        if not self.auto_send_running:
+            if not (connectors := self._campaign_connectors()): return
 
-            selected_items = self.tree.selection()
+            selected_items = self.list_view.selection()
             if not selected_items:
                 messagebox.showwarning("Início Requerido", "Por favor, selecione um contato na lista para iniciar o envio automático.")
                 return
 
-            selected_n = self.tree.item(selected_items[0], 'values')[0]
-            start_index = next((i for i, contact in enumerate(self.all_contacts) if contact[0] == selected_n), -1)
+            start_index = self.contact_store.index_of(selected_items[0])
 
             if start_index == -1:
                 messagebox.showerror("Erro", "Não foi possível encontrar o contato selecionado na lista de dados.")
                 return
 
-            self.auto_send_running = True
-            self.auto_send_stop_requested = False
-            self.current_auto_index = start_index
-            self.start_button.config(text="STOP", bg="#ffcccc")
-            self._start_auto_send()
-        else:
-            self._stop_auto_send()
-
-    def _stop_auto_send(self):
-        if self.countdown_after_id:
-            self.after_cancel(self.countdown_after_id)
-            self.countdown_after_id = None
-        
-        # Limpa a mensagem de contagem regressiva do item atual
-        if self.countdown_item_id and self.tree.exists(self.countdown_item_id):
-            self.tree.set(self.countdown_item_id, "status_envio", "")
-            self.countdown_item_id = None
-
-        self.auto_send_stop_requested = True
-        self.auto_send_running = False
-        self.start_button.config(text="START", bg="#ccffcc")
-        self.title("Huby App - Gerenciador e Enviador")
-        print("Envio automático interrompido pelo usuário")
-
-    def _start_auto_send(self):
-        if not self.auto_send_running or self.auto_send_stop_requested: return
-        
-        if self.current_auto_index >= len(self.all_contacts):
-            self._generate_send_report()
-            self._stop_auto_send()
-            messagebox.showinfo("Concluído", "Todos os contatos foram processados!")
-            return
-        
-        contact = self.all_contacts[self.current_auto_index]
-        contact_id = contact[0]
-        for item in self.tree.get_children():
-            if self.tree.item(item, 'values')[0] == contact_id:
-                self.tree.selection_set(item); self.tree.focus(item); self.tree.see(item)
-                self.on_item_select(None)
-                break
-        self.after(1000, self._send_auto_message)
-
-    def _send_auto_message(self):
-        if self.auto_send_stop_requested: return
-        
-        selected_id, contact_number, full_contact_data = self._get_selected_contact_info()
-        
-        # --- LÓGICA DE ATUALIZAÇÃO DO DESTAQUE ---
-        if self.last_sent_item_id:
-            try:
-                # Pega as tags existentes, remove 'last_sent' e reaplica as outras
-                current_tags = list(self.tree.item(self.last_sent_item_id, 'tags'))
-                if 'last_sent' in current_tags:
-                    current_tags.remove('last_sent')
-                self.tree.item(self.last_sent_item_id, tags=tuple(current_tags))
-            except tk.TclError:
-                pass # O item pode não existir mais, ignora o erro
-        
-        if selected_id:
-            self.last_sent_item_id = selected_id
-            self.last_sent_contact_n = contact_number
-        # --- FIM DA LÓGICA DE DESTAQUE ---
-
-        if not selected_id:
-            self.current_auto_index += 1; self.after(100, self._start_auto_send)
-            return
-        
-        connector = self._get_active_connector()
-        if not connector or not connector.is_connected:
-            self._stop_auto_send()
-            messagebox.showwarning("Envio Parado", "O envio foi interrompido (WhatsApp desconectado).")
-            return
-
-        template_aleatorio = random.choice(self.message_templates)
-        _, nome_completo, _, _, numero_telefone, _, _, _ = full_contact_data
-        nome_tratado = self._processar_nome(nome_completo)
-        mensagem_personalizada = template_aleatorio.replace("[nome]", nome_tratado)
-        mensagem_filtrada = self._filtrar_caracteres_bmp(mensagem_personalizada)
-        
-        success, message = connector.send_message(numero_telefone, mensagem_filtrada)
-        disparo_status = "Sucesso" if success else "Falhou"
-        self._update_disparo_status(contact_number, disparo_status)
-        
-        # Define a cor e o status na lista baseado no sucesso ou falha
-        if success:
-            self._add_campaign_sent_comment(contact_number, numero_telefone)
-            self.tree.item(selected_id, tags=('success',))
-            self.tree.set(selected_id, "status_envio", "✓ Sucesso")
-            print(f"Mensagem enviada com sucesso para {nome_completo}")
-        else:
-            self.tree.item(selected_id, tags=('failed',))
-            self.tree.set(selected_id, "status_envio", "✗ Falhou")
-            print(f"Erro ao enviar para {nome_completo}: {message}")
-        
-        # Aplica o destaque azul por cima da cor de status
-        current_tags = list(self.tree.item(selected_id, 'tags'))
-        if 'last_sent' not in current_tags:
-            current_tags.append('last_sent')
-        self.tree.item(selected_id, tags=tuple(current_tags))
-
-        self.current_auto_index += 1
-        if self.current_auto_index < len(self.all_contacts) and not self.auto_send_stop_requested:
-            intervalo = 1 # Intervalo padrão de 1 segundo para falhas
-            if success: # Se teve sucesso, calcula o intervalo aleatório
-                try:
-                    min_i = int(self.min_interval_var.get())
-                    max_i = int(self.max_interval_var.get())
-                    if min_i <= 0 or max_i < min_i: raise ValueError("Intervalo inválido")
-                    intervalo = random.randint(min_i, max_i)
-                except (ValueError, tk.TclError):
-                    messagebox.showwarning("Intervalo Inválido", "Intervalo inválido. Usando padrão (20-45s).")
-                    self.min_interval_var.set("20"); self.max_interval_var.set("45")
-                    intervalo = random.randint(20, 45)
-
-            print(f"Próximo envio em {intervalo} segundos...")
-            
-            # Encontra o ID do próximo item para exibir o contador
-            proximo_contato = self.all_contacts[self.current_auto_index]
-            proximo_contato_id_n = proximo_contato[0]
-            proximo_item_id = None
-            for item in self.tree.get_children():
-                if self.tree.item(item, 'values')[0] == proximo_contato_id_n:
-                    proximo_item_id = item
-                    break
-            
-            if proximo_item_id:
-                self._update_countdown_in_list(proximo_item_id, intervalo)
+            state = self.campaign_checkpoint.state() if self.campaign_checkpoint else None
+            if state and not state.finished and state.contacts and not messagebox.askyesno(
+                    "Campanha Interrompida",
+                    f"Há uma campanha interrompida nesta lista ({len(state.contacts)} contatos já processados).\n\n"
+                    "Iniciar uma nova campanha descarta esse progresso. Para continuar de onde parou, "
+                    "use 'Retomar Campanha' no menu de contexto.\n\nIniciar nova campanha?"):
+                return
 
-            self.after(intervalo * 1000, self._start_auto_send)
+            self._checkpoint("begin", selected_items[0], [c.session_name for c in connectors])
+            self._launch_campaign(connectors, [c.n for c in self.all_contacts[start_index:]])
         else:
-            if not self.auto_send_stop_requested: self._start_auto_send()
-            else: self._stop_auto_send()
+            self._stop_auto_send()
 
-    def _add_contact_not_found_comment(self, contact_number, telefone_id, nome_completo):
-        timestamp = datetime.now().strftime("%d de %B, %H:%M de %Y")
-        comment_text = f"{timestamp} - Contato não encontrado no WhatsApp"
-        self._add_comment_to_contact(contact_number, telefone_id, comment_text)
-        for i, contact in enumerate(self.all_contacts):
-            if contact[0] == contact_number:
-                contact_list = list(contact); contact_list[3] = "Não encontrado"
-                self.all_contacts[i] = tuple(contact_list)
-                break
-        for item in self.tree.get_children():
-            if self.tree.item(item, 'values')[0] == contact_number:
-                values = list(self.tree.item(item, 'values')); values[3] = "Não encontrado"
-                self.tree.item(item, values=values)
-                break
+    def _resume_campaign(self):
+        """Continua a última campanha da lista, pulando contatos e telefones já processados."""
+        if self.auto_send_running:
+            messagebox.showwarning("Modo Automático", "O envio automático já está ativo."); return
+        state = self.campaign_checkpoint.state() if self.campaign_checkpoint else None
+        if not state or state.finished:
+            messagebox.showinfo("Retomar Campanha", "Não há campanha interrompida para esta lista."); return
+        if not (connectors := self._campaign_connectors()): return
+
+        pending = self._resume_pending(state)
+        uncertain = sum(1 for s in state.contacts.values() if s == CampaignCheckpoint.SENDING)
+        if not pending:
+            messagebox.showinfo("Retomar Campanha", "Todos os contatos da campanha já foram processados.")
+            self._checkpoint("finish"); return
+        msg = f"Retomar a campanha com {len(pending)} contatos restantes?"
+        if uncertain:
+            msg += f"\n\n{uncertain} envio(s) ficaram sem confirmação na interrupção e não serão repetidos (marcados com '? Verificar')."
+        if not messagebox.askyesno("Retomar Campanha", msg): return
+
+        self._checkpoint("resume", [c.session_name for c in connectors])
+        self._launch_campaign(connectors, pending)
 
     def _load_messages_from_paths(self, filepaths):
-        loaded_templates, loaded_paths, failed_files = [], [], []
-        for path in filepaths:
-            if not os.path.exists(path): failed_files.append(os.path.basename(path)); continue
-            try:
-                with open(path, 'r', encoding='utf-8') as file:
-                    loaded_templates.append(file.read()); loaded_paths.append(path)
-            except Exception: failed_files.append(os.path.basename(path))
+        loaded_templates, loaded_paths, failed_files = self._read_templates(filepaths)
         
         if not loaded_templates:
             self.status_txt_var.set("Templates: 0") # Atualiza se falhar
@@ -793,13 +3240,8 @@ class App(tk.Tk):
             messagebox.showinfo("Sucesso", msg)
         else: messagebox.showerror("Erro", "Não foi possível carregar nenhum template.")
 
-    def _processar_nome(self, nome_completo):
-        if not isinstance(nome_completo, str) or not nome_completo.strip(): return ""
-        palavras = nome_completo.split()
-        return palavras[1] if palavras[0].lower() in ['doutor', 'dr.'] and len(palavras) > 1 else palavras[0]
-
     def _filtrar_caracteres_bmp(self, texto):
-        return "".join(c for c in texto if ord(c) <= 0xFFFF)
+        return MessageTemplate.filter_bmp(texto)
 
     def _create_widgets(self):
         top_controls_frame = tk.Frame(self, bg="#F0F0F0", padx=5, pady=5)
@@ -834,25 +3276,29 @@ class App(tk.Tk):
 
     def _enable_entry_edit(self, event):
         entry = event.widget
-        if not self.tree.selection(): return
+        if not self.list_view.selection(): return
         self.original_edit_value = entry.get()
         entry.config(state="normal", readonlybackground="white"); entry.focus_set(); entry.select_range(0, 'end')
 
     def _save_entry_edit(self, event):
         entry = event.widget; new_value = entry.get().strip()
         if new_value == self.original_edit_value or not new_value: self._cancel_entry_edit(event); return "break"
-        selected_id, contact_number, _ = self._get_selected_contact_info()
-        if not selected_id: self._cancel_entry_edit(event); return "break"
+        contact_number, _ = self._get_selected_contact_info()
+        if not contact_number: self._cancel_entry_edit(event); return "break"
         if entry == self.nome_entry:
             new_value_formatted = new_value.title()
-            self._update_contact_data(selected_id, contact_number, 1, new_value_formatted)
+            self._update_contact_data(contact_number, "nome", new_value_formatted)
             self._save_edit_to_csv(contact_number, 0, new_value_formatted)
             self.nome_var.set((new_value_formatted[:20] + '...').upper() if len(new_value_formatted) > 20 else new_value_formatted.upper())
         elif entry == self.telefone_entry:
             new_phone_id = "".join(filter(str.isdigit, new_value))
-            new_phone_formatted = self._formatar_telefone(new_phone_id)
-            self._update_contact_data(selected_id, contact_number, 2, new_phone_formatted, phone_id=new_phone_id)
+            contact = self.contact_store.get(contact_number)
+            self.phone_normalizer.forget(contact)
+            self._update_contact_data(contact_number, "telefone_id", new_phone_id)
+            self.phone_normalizer.apply(contact)
             self._save_edit_to_csv(contact_number, 2, new_phone_id)
+            self.telefone_var.set(self._formatar_telefone(new_phone_id))
+            if contact.phone_issue: messagebox.showwarning("Telefone Inválido", f"{contact.phone_issue}: {new_value}")
         entry.config(state="readonly", readonlybackground="#F0F0F0"); self.tree.focus_set(); return "break"
 
     def _cancel_entry_edit(self, event):
@@ -860,25 +3306,17 @@ class App(tk.Tk):
             event.widget.config(state="readonly", readonlybackground="#F0F0F0"); self.tree.focus_set()
         return "break"
 
-    def _update_contact_data(self, selected_id, contact_number, value_index, new_value, phone_id=None):
-        for i, contact in enumerate(self.all_contacts):
-            if contact[0] == contact_number:
-                cl = list(contact); cl[value_index] = new_value
-                if phone_id is not None: cl[4] = phone_id
-                self.all_contacts[i] = tuple(cl)
-                break
-        current_values = list(self.tree.item(selected_id, 'values')); current_values[value_index] = new_value
-        self.tree.item(selected_id, values=current_values)
+    def _update_contact_data(self, contact_number, field, new_value):
+        self.contact_store.set_field(contact_number, field, new_value)
+        self._forget_rendered(contact_number)
+        self.list_view.refresh_row(contact_number)
 
     def _get_selected_contact_info(self):
-        if not (selected_items := self.tree.selection()):
+        if not (selected_items := self.list_view.selection()):
             messagebox.showwarning("Nenhuma Seleção", "Por favor, selecione um contato primeiro.")
-            return None, None, None
-        selected_id = selected_items[0]
-        values = self.tree.item(selected_id, 'values')
-        contact_number = values[0]
-        full_contact_data = next((c for c in self.all_contacts if c[0] == contact_number), None)
-        return selected_id, contact_number, full_contact_data
+            return None, None
+        contact_number = selected_items[0]
+        return contact_number, self.contact_store.get(contact_number)
 
     def _create_context_menu(self):
         self.context_menu = tk.Menu(self, tearoff=0)
@@ -892,6 +3330,9 @@ class App(tk.Tk):
         self.context_menu.add_command(label="Editar Telefone", command=lambda: self._enable_entry_edit(SimpleNamespace(widget=self.telefone_entry)))
         self.context_menu.add_separator()
         self.context_menu.add_command(label="Adicionar Novo Contato", command=self._add_new_contact)
+        self.context_menu.add_command(label="Exportar Lista (CSV)...", command=self._export_csv)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="Retomar Campanha", command=self._resume_campaign)
 
     def _add_new_contact(self):
         if not self.current_filepath:
@@ -932,13 +3373,14 @@ class App(tk.Tk):
                 return
 
             telefone_padronizado = ''.join(filter(str.isdigit, telefone))
+            if (issue := PhoneNormalizer.problem(PhoneNormalizer.e164(telefone_padronizado))) and not messagebox.askyesno(
+                    "Telefone Inválido", f"{issue}: {telefone}\n\nSalvar mesmo assim?", parent=dialog):
+                return
 
             try:
                 new_row = [nome, '', telefone_padronizado]
-                
-                with open(self.current_filepath, 'a', newline='', encoding='utf-8') as file:
-                    writer = csv.writer(file)
-                    writer.writerow(new_row)
+                if self.database: self.database.append_row(self.current_filepath, new_row)
+                else: self.csv_journal.record_append(new_row)
                 
                 dialog.destroy()
                 messagebox.showinfo("Sucesso", f"Contato '{nome}' adicionado com sucesso!\nA lista será recarregada.")
@@ -954,26 +3396,27 @@ class App(tk.Tk):
         nome_entry.focus_set()
         self.wait_window(dialog)
 
-    def _save_edit_to_csv(self, contact_number, column_index, new_value):
-        if not self.current_filepath: return False
+    def _export_csv(self):
+        if not self.current_filepath:
+            messagebox.showwarning("Nenhum Arquivo", "Carregue um arquivo CSV antes de exportar."); return
+        if not (dest := filedialog.asksaveasfilename(title="Exportar Lista", defaultextension=".csv",
+                                                    filetypes=[("Arquivos CSV", "*.csv")],
+                                                    initialfile=os.path.basename(self.current_filepath))): return
         try:
-            with open(self.current_filepath, 'r', encoding='utf-8', newline='') as file: lines = list(csv.reader(file))
-            target_line_index = int(contact_number)
-            if 0 < target_line_index < len(lines):
-                target_row = lines[target_line_index]
-                while len(target_row) <= column_index: target_row.append('')
-                target_row[column_index] = new_value
-                with open(self.current_filepath, 'w', encoding='utf-8', newline='') as file: csv.writer(file).writerows(lines)
-                return True
-            return False
-        except Exception as e: print(f"ERRO ao editar CSV: {e}"); return False
+            if self.database: self.database.export_list(self.current_filepath, dest)
+            else:
+                self._sync_list_file()
+                shutil.copyfile(self.current_filepath, dest)
+            messagebox.showinfo("Lista Exportada", f"A lista foi exportada para:\n{dest}")
+        except Exception as e: messagebox.showerror("Erro ao Exportar", f"Não foi possível exportar a lista.\nErro: {e}")
 
     def _create_search_frame(self, parent):
         search_frame = tk.Frame(parent, bg="#F0F0F0"); search_frame.pack(fill="x", pady=(3, 0))
         tk.Label(search_frame, text="Pesquisar NOME:", bg="#F0F0F0").pack(side="left")
         search_entry = tk.Entry(search_frame, textvariable=self.search_var)
         search_entry.pack(side="left", padx=3, fill="x", expand=True)
-        self.search_var.trace_add("write", self._filter_contacts)
+        Tooltip(search_entry, "Parte do nome (sem diferenciar acentos), dígitos do telefone ou 'status:' seguido do status")
+        self.search_var.trace_add("write", self._schedule_filter)
         search_entry.bind("<Down>", self._focus_list_and_select_first); search_entry.bind("<Up>", self._focus_list_and_select_first)
 
     def _create_main_layout(self):
@@ -1019,11 +3462,15 @@ class App(tk.Tk):
         self.tree.column("status", width=100)
         self.tree.column("disparo", width=80, anchor="center")
 
-        scrollbar = ttk.Scrollbar(tree_container, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set); scrollbar.pack(side="right", fill="y")
+        scrollbar = ttk.Scrollbar(tree_container, orient="vertical")
+        scrollbar.pack(side="right", fill="y")
         self.tree.pack(side="left", fill="both", expand=True)
-        self.tree.bind("<<TreeviewSelect>>", self.on_item_select); self.tree.bind("<Button-3>", self._show_context_menu)
+        # A Treeview só guarda as linhas visíveis; a lista completa fica no ContactStore.
+        self.list_view = VirtualTreeview(self.tree, scrollbar, self.contact_store, self._row_values, on_select=self.on_item_select)
+        self.tree.bind("<Button-3>", self._show_context_menu)
         self.tree.bind("<Up>", self._select_previous_item); self.tree.bind("<Down>", self._select_next_item)
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self.list_view.visible))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self.list_view.visible))
 
         self.custom_message_panel = tk.Frame(list_frame, bg="#e0e0e0")
         
@@ -1071,34 +3518,54 @@ class App(tk.Tk):
     def on_item_select(self, event):
         for entry in [self.nome_entry, self.telefone_entry]:
             if entry.cget('state') == 'normal': self._cancel_entry_edit(SimpleNamespace(widget=entry))
-        if not (selected_items := self.tree.selection()):
+        if not (selected_items := self.list_view.selection()):
             self.nome_var.set(""); self.telefone_var.set(""); self.comment_text.config(state="disabled")
             self.comment_text.delete("1.0", tk.END)
             return
-        selected_n = self.tree.item(selected_items[0], 'values')[0]
-        if full_contact_data := next((c for c in self.all_contacts if c[0] == selected_n), None):
-            _, nome, tel_fmt, _, tel_id, _, _, _ = full_contact_data
+        if full_contact_data := self.contact_store.get(selected_items[0]):
+            nome, tel_id = full_contact_data.nome, full_contact_data.telefone_id
             self.nome_var.set((nome[:20] + '...').upper() if len(nome) > 20 else nome.upper())
-            self.telefone_var.set(tel_fmt)
+            self.telefone_var.set(full_contact_data.telefone)
             comment = self.comments.get(tel_id, "")
             self.comment_text.config(state="normal"); self.comment_text.delete("1.0", tk.END)
             self.comment_text.insert(tk.END, comment)
             
-            self._clear_and_update_chat_history("Carregando mensagens...")
-            threading.Thread(target=self._fetch_and_display_messages, args=(tel_id,), daemon=True).start()
+            self._show_chat_history(tel_id)
 
-    def _fetch_and_display_messages(self, phone_number):
+    def _show_chat_history(self, phone_number):
+        """Exibe a conversa do cache ou agenda a busca; navegar pela lista não dispara uma busca por linha."""
+        if self.chat_fetch_after_id:
+            self.after_cancel(self.chat_fetch_after_id)
+            self.chat_fetch_after_id = None
         connector = self._get_active_connector()
         if not connector or not connector.is_connected:
-            self.after(0, self._clear_and_update_chat_history, "Perfil desconectado.")
+            self.chat_history_key = None; self.chat_fetcher.cancel()
+            self._clear_and_update_chat_history("Perfil desconectado.")
             return
 
-        success, data = connector.get_messages_for_contact(phone_number)
-        
-        if success:
-            self.after(0, self._display_messages, data)
-        else:
-            self.after(0, self._clear_and_update_chat_history, f"Erro:\n{data}")
+        self.chat_history_key = key = (connector.session_name, PhoneNormalizer.e164(phone_number))
+        if (messages := self.chat_fetcher.cached(key)) is not None:
+            self.chat_fetcher.cancel()
+            self._display_messages(messages)
+            return
+        self._clear_and_update_chat_history("Carregando mensagens...")
+        self.chat_fetch_after_id = self.after(250, self._fetch_chat_history, key, connector)
+
+    def _fetch_chat_history(self, key, connector):
+        self.chat_fetch_after_id = None
+        if key != self.chat_history_key: return
+        self.chat_fetcher.request(key, connector)
+        if not self.chat_poll_id: self._poll_chat_history()
+
+    def _poll_chat_history(self):
+        self.chat_poll_id = None
+        while True:
+            try: key, success, data = self.chat_history_results.get_nowait()
+            except queue.Empty: break
+            if key != self.chat_history_key: continue # resposta de um contato que já saiu da tela
+            if success: self._display_messages(data)
+            else: self._clear_and_update_chat_history(f"Erro:\n{data}")
+        if self.chat_fetcher.busy(): self.chat_poll_id = self.after(100, self._poll_chat_history)
 
     def _display_messages(self, messages):
         self.chat_history_text.config(state="normal")
@@ -1137,59 +3604,80 @@ class App(tk.Tk):
         self.after_id = self.after(1500, self._save_comment)
 
     def _save_comment(self):
-        if not (selected_items := self.tree.selection()): return
-        selected_n = self.tree.item(selected_items[0], 'values')[0]
-        if telefone_id := next((c[4] for c in self.all_contacts if c[0] == selected_n), None):
+        if not (selected_items := self.list_view.selection()): return
+        if full_contact_data := self.contact_store.get(selected_items[0]):
+            telefone_id = full_contact_data.telefone_id
             self.comments[telefone_id] = self.comment_text.get("1.0", tk.END).strip()
-            self._save_all_comments_to_file()
 
-    def _save_all_comments_to_file(self):
-        try:
-            with open(self.comments_filepath, "w", encoding='utf-8') as f: json.dump(self.comments, f, indent=4, ensure_ascii=False)
-        except Exception as e: print(f"Erro ao salvar comentários: {e}")
-
-    def _load_data_from_path(self, filepath):
-        if self.last_sent_item_id:
-            try:
-                self.tree.item(self.last_sent_item_id, tags=())
-            except tk.TclError:
-                pass 
+    def _load_data_from_path(self, filepath, on_loaded=None):
+        self.list_view.reset()
         self.last_sent_item_id = None
         self.last_sent_contact_n = None
         
+        if self.current_filepath and self.current_filepath != filepath:
+            threading.Thread(target=self._sync_list_file, args=(self.current_filepath, self.csv_journal), daemon=True).start()
         self.current_filepath = filepath
-        try:
-            with open(self.comments_filepath, "r", encoding='utf-8') as f: self.comments = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError): self.comments = {}
-        
-        nova_lista_contatos_full = []
-        try:
-            with open(filepath, mode='r', encoding='utf-8') as file:
-                csv_reader = csv.reader(file); next(csv_reader, None)
-                for i, row in enumerate(csv_reader, 1):
-                    if not row: continue
-                    tel_id = row[2] if len(row) > 2 else ""
-                    # Estrutura do tuple de 8 elementos
-                    nova_lista_contatos_full.append((f"{i:03d}", row[0] if len(row) > 0 else "", 
-                                                     self._formatar_telefone(tel_id), row[3] if len(row) > 3 else "",
-                                                     tel_id, "", "", ""))
-            self.all_contacts = nova_lista_contatos_full
-            self.nome_var.set(""); self.telefone_var.set("")
-            
-            file_name = os.path.basename(filepath)
-            self.status_list_var.set(f"Lista: {file_name}")
-
-            # Estrutura de exibição com 6 colunas
-            display_data = [(c[0], c[1], c[2], c[7], c[3], c[6]) for c in self.all_contacts]
-            self._populate_treeview(display_data)
-        except Exception as e:
-            self.status_list_var.set("Erro ao carregar lista")
-            messagebox.showerror("Erro ao ler arquivo", f"Ocorreu um erro: {e}")
+        self.csv_journal = None if self.database else CsvEditJournal(filepath)
+        self.campaign_checkpoint = CampaignCheckpoint(filepath)
+
+        # Cancela uma carga anterior ainda em andamento; seus lotes serão ignorados.
+        if self.list_loader: self.list_loader.cancel()
+        self.contact_store.load([])
+        self.sort_state = None
+        self._refresh_list_view()
+        self.nome_var.set(""); self.telefone_var.set("")
+        self.list_loaded_callback = on_loaded
+        # Cada carga tem o seu normalizador: uma carga cancelada não mistura os duplicados da nova.
+        self.phone_normalizer = normalizer = PhoneNormalizer(self.phone_memos.setdefault(filepath, {}))
+        self.list_loader = ContactListLoader(filepath, self.list_load_results,
+                                             lambda n, row: normalizer.apply(self._build_contact(n, row)),
+                                             journal=self.csv_journal, database=self.database,
+                                             index_chunk=ContactSearchIndex.prepare)
+        self.status_list_var.set(f"Carregando {os.path.basename(filepath)}...")
+        self.list_loader.start()
+        if not self.list_load_after_id: self._poll_list_loader()
+
+    def _poll_list_loader(self):
+        self.list_load_after_id = None
+        deadline = time.monotonic() + self.LIST_LOAD_SLICE
+        while time.monotonic() < deadline:
+            try: kind, loader, payload, progress = self.list_load_results.get_nowait()
+            except queue.Empty: break
+            if loader is not self.list_loader: continue # lote de uma carga cancelada
+            file_name = os.path.basename(loader.filepath)
+            if kind == "chunk":
+                contacts, index = payload
+                self.search_index.merge(index) # trigramas prontos da thread de carga
+                self.contact_store.extend(contacts)
+                if not self.sort_state and not self.search_var.get().strip():
+                    self.list_view.append_rows([c.n for c in contacts])
+                self.status_list_var.set(f"Carregando {file_name}... {progress:.0%} ({len(self.contact_store)} contatos)")
+            elif kind == "done":
+                self.list_loader = None
+                self.list_columns = {MessageTemplate.field_key(name): i for i, name in enumerate(loader.header) if name.strip()}
+                invalid = sum(1 for c in self.all_contacts if c.phone_issue)
+                self.status_list_var.set(f"Lista: {file_name}" + (f" ({invalid} telefones inválidos ou duplicados)" if invalid else ""))
+                self._restore_campaign_progress()
+                if self.sort_state or self.search_var.get().strip(): self._refresh_list_view()
+                if callback := self.list_loaded_callback:
+                    self.list_loaded_callback = None
+                    callback()
+            else:
+                self.list_loader = None
+                self.status_list_var.set("Erro ao carregar lista")
+                messagebox.showerror("Erro ao ler arquivo", f"Ocorreu um erro: {payload}")
+        if self.list_loader:
+            backlog = not self.list_load_results.empty()
+            self.list_load_after_id = self.after(1 if backlog else 50, self._poll_list_loader)
     
+    def _restore_campaign_progress(self):
+        if (state := super()._restore_campaign_progress()) and not state.finished:
+            self.status_list_var.set(f"{self.status_list_var.get()} | Campanha interrompida ({len(state.contacts)} processados)")
+
     def _save_state(self):
         state = {
             "last_filepath": self.current_filepath,
-            "last_selected_contact": self.tree.item(self.tree.selection()[0], 'values')[0] if self.tree.selection() else "",
+            "last_selected_contact": self.list_view.selection()[0] if self.list_view.selection() else "",
             "last_geometry": self.geometry(),
             "last_message_files": self.message_templates_paths,
             "min_interval": self.min_interval_var.get(),
@@ -1197,7 +3685,10 @@ class App(tk.Tk):
             "wpp_panel_visible": self.is_custom_message_panel_visible,
             "profile_names": self.profile_names,
             "active_profile": self.active_profile_name.get(),
-            "last_sent_contact_n": self.last_sent_contact_n
+            "last_sent_contact_n": self.last_sent_contact_n,
+            "storage_backend": "sqlite" if self.database else "files",
+            "parallel_send": self.parallel_send_var.get(),
+            **self._campaign_config()
         }
         try:
             with open(self.config_filepath, "w") as f: json.dump(state, f, indent=4)
@@ -1207,15 +3698,18 @@ class App(tk.Tk):
         if not os.path.exists(self.config_filepath): return
         try:
             with open(self.config_filepath, "r") as f: state = json.load(f)
+            if state.get("storage_backend") == "sqlite": self._enable_database()
             if state.get("last_geometry"): self.geometry(state.get("last_geometry"))
             self.min_interval_var.set(state.get("min_interval", "20"))
             self.max_interval_var.set(state.get("max_interval", "45"))
             
             if message_files := state.get("last_message_files"): self._load_messages_from_paths(message_files)
 
+            self._apply_campaign_config(state)
+            self.parallel_send_var.set(state.get("parallel_send", False))
             self.profile_names = state.get("profile_names", [])
             for name in self.profile_names:
-                self.whatsapp_connectors[name] = WhatsAppConnector(session_name=name)
+                self.whatsapp_connectors[name] = self._create_connector(name)
             
             active_prof = state.get("active_profile")
             if active_prof in self.profile_names:
@@ -1225,21 +3719,17 @@ class App(tk.Tk):
 
             if filepath := state.get("last_filepath"):
                 if os.path.exists(filepath):
-                    self._load_data_from_path(filepath)
-                    
-                    if last_sent_n := state.get("last_sent_contact_n"):
-                        self.last_sent_contact_n = last_sent_n
-                        for child_id in self.tree.get_children():
-                            if self.tree.item(child_id, 'values')[0] == last_sent_n:
-                                self.tree.item(child_id, tags=('last_sent',))
-                                self.last_sent_item_id = child_id
-                                break
-                    
-                    if last_contact := state.get("last_selected_contact"):
-                        for child in self.tree.get_children():
-                            if self.tree.item(child, 'values')[0] == last_contact:
-                                self.tree.selection_set(child); self.tree.focus(child); self.tree.see(child)
-                                break
+                    # Restaura destaque e seleção quando a carga em segundo plano terminar
+                    def restore_list_state():
+                        if last_sent_n := self._contact_n(state.get("last_sent_contact_n")):
+                            self.last_sent_contact_n = last_sent_n
+                            if self.list_view.exists(last_sent_n):
+                                self.list_view.set_tags(last_sent_n, ('last_sent',))
+                                self.last_sent_item_id = last_sent_n
+                        
+                        if last_contact := self._contact_n(state.get("last_selected_contact")):
+                            self.list_view.select(last_contact)
+                    self._load_data_from_path(filepath, on_loaded=restore_list_state)
                 else:
                     warning_message = f"O arquivo da lista anterior não foi encontrado no caminho:\n\n{filepath}\n\nEle pode ter sido movido ou excluído."
                     messagebox.showwarning("Arquivo Não Encontrado", warning_message)
@@ -1250,58 +3740,89 @@ class App(tk.Tk):
 
         except Exception as e: print(f"Erro ao carregar estado: {e}")
 
+    def _enable_database(self):
+        """Ativa o backend SQLite: lista, observações e envios passam a ser gravados em huby.db."""
+        try:
+            self.database = HubyDatabase(self.database_filepath)
+            self.comments = SQLiteCommentStore(self.database, self.comments_filepath)
+            self.comments.load()
+        except sqlite3.Error as e:
+            print(f"Erro ao abrir banco SQLite, usando arquivos: {e}")
+            self.database = None
+
     def _on_closing(self):
-        self._save_comment(); self._save_state(); self.destroy()
+        self._save_comment(); self._save_state()
+        for worker in self.campaign_workers.values(): worker.stop()
+        self.chat_fetcher.close()
+        self._sync_list_file()
+        self.comments.flush()
+        if self.database: self.database.close()
+        for profile_name in list(self.whatsapp_connectors): self._close_connector(profile_name)
+        if aiohttp: AsyncWhatsAppConnector.shutdown()
+        self.destroy()
 
     def _focus_list_and_select_first(self, event):
-        if visible_items := self.tree.get_children():
-            self.tree.focus_set(); self.tree.selection_set(visible_items[0]); self.tree.focus(visible_items[0])
+        if len(self.list_view):
+            self.tree.focus_set(); self.list_view.select(self.list_view.row_at(0))
             return "break"
 
+    def _schedule_filter(self, *args):
+        # Agrupa as teclas digitadas em sequência numa única atualização da lista.
+        if self.search_after_id: self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(150, self._filter_contacts)
+
     def _filter_contacts(self, *args):
-        search_term = self.search_var.get().lower()
-        filtered = [c for c in self.all_contacts if not search_term or search_term in str(c[1]).lower()]
-        display_data = [(c[0], c[1], c[2], c[7], c[3], c[6]) for c in filtered]
-        self._populate_treeview(display_data)
+        self.search_after_id = None
+        self._refresh_list_view()
+
+    def _refresh_list_view(self):
+        """Recalcula as linhas exibidas combinando a pesquisa atual e a última ordenação."""
+        filtered = self.search_index.search(self.search_var.get())
+        if self.sort_state:
+            column, reverse = self.sort_state
+            rows = self.sort_index.sort(column, filtered)
+        else:
+            rows, reverse = ([c.n for c in self.all_contacts] if filtered is None else filtered), False
+        self._populate_treeview(rows, reverse)
 
-    def _select_previous_item(self, event):
-        if (ci := self.tree.focus()) and (pi := self.tree.prev(ci)):
-            self.tree.selection_set(pi); self.tree.focus(pi); self.tree.see(pi)
+    def _move_selection(self, delta):
+        if self.list_view.focus(): self.list_view.move_selection(delta)
         return "break"
 
+    def _select_previous_item(self, event):
+        return self._move_selection(-1)
+
     def _select_next_item(self, event):
-        if (ci := self.tree.focus()) and (ni := self.tree.next(ci)):
-            self.tree.selection_set(ni); self.tree.focus(ni); self.tree.see(ni)
-        return "break"
+        return self._move_selection(1)
 
     def _sort_column(self, col, reverse):
-        col_map = {"n": 0, "nome": 1, "telefone": 2, "status": 3, "disparo": 6, "status_envio": 7}
-        
-        sort_index = col_map.get(col)
-        if sort_index is None: return
-
-        current_order_n = [self.tree.set(c, "n") for c in self.tree.get_children('')]
-        data_to_sort = [c for n in current_order_n for c in self.all_contacts if c[0] == n]
-        
-        key_func = (lambda t: int(t[sort_index])) if col == 'n' else (lambda t: str(t[sort_index]).lower())
-        data_to_sort.sort(key=key_func, reverse=reverse)
-        
-        display_data = [(c[0], c[1], c[2], c[7], c[3], c[6]) for c in data_to_sort]
-        self._populate_treeview(display_data)
+        if col not in ContactSortIndex.COLUMN_FIELDS: return
+        if self.sort_state and self.sort_state[0] == col:
+            # Mesma coluna: basta inverter a exibição.
+            self.list_view.set_reversed(reverse)
+            self.sort_state = (col, reverse)
+        else:
+            self.sort_state = (col, reverse)
+            self._refresh_list_view()
         
         self.tree.heading(col, command=lambda _c=col: self._sort_column(_c, not reverse))
 
-    def _populate_treeview(self, data):
-        self.tree.delete(*self.tree.get_children())
-        for contact in data: self.tree.insert("", "end", values=contact)
+    def _populate_treeview(self, contact_numbers, reverse=False):
+        self.list_view.set_rows(contact_numbers, reverse)
+
+    @staticmethod
+    def _contact_n(value):
+        """Converte o N salvo no estado (inteiro, ou texto "001" de versões antigas) para inteiro."""
+        try: return int(value) if value not in (None, "") else None
+        except (TypeError, ValueError): return None
+
+    @staticmethod
+    def _row_values(contact):
+        # Estrutura de exibição com 6 colunas
+        return (contact.numero, contact.nome, contact.telefone, contact.status_envio, contact.status, contact.disparo)
 
     def _formatar_telefone(self, numero_str):
-        n = ''.join(filter(str.isdigit, str(numero_str)))
-        if len(n) == 13: return f"+{n[:2]} ({n[2:4]}) {n[4:9]}-{n[9:]}"
-        if len(n) == 12: return f"+{n[:2]} ({n[2:4]}) {n[4:8]}-{n[8:]}"
-        if len(n) == 11: return f"({n[:2]}) {n[2:7]}-{n[7:]}"
-        if len(n) == 10: return f"({n[:2]}) {n[2:6]}-{n[6:]}"
-        return numero_str
+        return Contact.formatar_telefone(numero_str)
 
     # --- MÉTODO QUE ESTAVA FALTANDO ---
     def _carregar_csv(self):
@@ -1310,74 +3831,255 @@ class App(tk.Tk):
 
     def _show_context_menu(self, event):
         item_id = self.tree.identify_row(event.y)
-        if item_id:
-            self.tree.selection_set(item_id)
+        if item_id and (contact_number := self.contact_store.n_for_item(item_id)):
+            self.list_view.select(contact_number)
         self.context_menu.post(event.x_root, event.y_root)
 
     def _set_status(self, new_status):
-        if not (selected_items := self.tree.selection()):
+        if not (selected_items := self.list_view.selection()):
             messagebox.showwarning("Nenhum Contato", "Selecione um contato para alterar o status."); return
         timestamp = datetime.now().strftime("%d de %B de %Y, %H:%M"); new_comment_line = f"{timestamp}\n{new_status}"
-        for item_id in selected_items:
-            contact_number = self.tree.item(item_id, 'values')[0]
-            for i, contact in enumerate(self.all_contacts):
-                if contact[0] == contact_number:
-                    n, nome, tel, _, tel_id, o_s, d, s_e = contact
-                    self.all_contacts[i] = (n, nome, tel, new_status, tel_id, o_s, d, s_e)
-                    if new_status:
-                        self._add_comment_to_contact(contact_number, tel_id, new_comment_line)
-                    break
-            v = list(self.tree.item(item_id, 'values')); v[4] = new_status; self.tree.item(item_id, values=v)
+        for contact_number in selected_items:
+            if contact := self.contact_store.set_field(contact_number, "status", new_status):
+                if new_status:
+                    self._add_comment_to_contact(contact_number, contact.telefone_id, new_comment_line)
+            self.list_view.refresh_row(contact_number)
             if not self._save_status_to_csv(contact_number, new_status):
-                messagebox.showerror("Erro ao Salvar", f"Não foi possível salvar a alteração para {contact_number}.")
+                messagebox.showerror("Erro ao Salvar", f"Não foi possível salvar a alteração para {contact_number:03d}.")
                 self._load_data_from_path(self.current_filepath); return
         self.on_item_select(None)
     
-    def _update_disparo_status(self, contact_number, new_disparo_status):
-        for i, contact in enumerate(self.all_contacts):
-            if contact[0] == contact_number:
-                n, nome, tel, s, tel_id, o_s, _, s_e = contact
-                self.all_contacts[i] = (n, nome, tel, s, tel_id, o_s, new_disparo_status, s_e); break
-        for item in self.tree.get_children():
-            if self.tree.item(item, 'values')[0] == contact_number:
-                v = list(self.tree.item(item, 'values')); v[5] = new_disparo_status
-                self.tree.item(item, values=tuple(v)); break
-
     def _generate_send_report(self):
-        timestamp = datetime.now().strftime("%d de %B de %Y, %H:%M:%S")
-        processed_contacts = [c for c in self.all_contacts if c[6]]
-        if not processed_contacts: return
-        success = [c for c in processed_contacts if c[6] == "Sucesso"]
-        failed = [c for c in processed_contacts if c[6] == "Falhou"]
-        content = [f"Relatório de Disparos - {timestamp}", "="*50, "Resumo:",
-                   f"  - Envios Tentados: {len(processed_contacts)}", f"  - Sucessos: {len(success)}",
-                   f"  - Falhas: {len(failed)}", "\n" + "="*50 + "\n"]
-        if success:
-            content.append("ENVIOS COM SUCESSO:"); content.extend([f"  - [{c[0]}] {c[1]} - {c[2]}" for c in success]); content.append("\n")
-        if failed:
-            content.append("ENVIOS QUE FALHARAM:"); content.extend([f"  - [{c[0]}] {c[1]} - {c[2]}" for c in failed]); content.append("\n")
+        if not (content := self._send_report_text()): return
         try:
             if fp := filedialog.asksaveasfilename(title="Salvar Relatório de Disparos", defaultextension=".txt",
                                                     filetypes=[("Arquivos de Texto", "*.txt")],
                                                     initialfile=f"Relatorio_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"):
-                with open(fp, "w", encoding="utf-8") as f: f.write("\n".join(content))
+                with open(fp, "w", encoding="utf-8") as f: f.write(content)
                 messagebox.showinfo("Relatório Salvo", f"O relatório foi salvo com sucesso em:\n{fp}")
         except Exception as e: messagebox.showerror("Erro ao Salvar Relatório", f"Não foi possível salvar.\nErro: {e}")
 
-    def _save_status_to_csv(self, contact_number, new_status):
-        if not self.current_filepath: return False
+# ===================================================================
+# CAMPANHA SEM INTERFACE (LINHA DE COMANDO)
+# ===================================================================
+class HeadlessCampaign(CampaignEngine):
+    """
+    Roda o CampaignEngine sem Tk, para servidores sem tela ao lado do wppconnect.
+    Os after() do motor viram uma fila de agendamentos executada por run() na
+    thread principal; os arquivos gravados (CSV ou huby.db, comentários,
+    históricos, checkpoint e relatório) são os mesmos do App.
+    """
+    def __init__(self, data_dir, state, report_path=None):
+        self.database = None
+        comments_filepath = os.path.join(data_dir, "comentarios.json")
+        if state.get("storage_backend") == "sqlite":
+            try:
+                self.database = HubyDatabase(os.path.join(data_dir, "huby.db"))
+                self.comments = SQLiteCommentStore(self.database, comments_filepath)
+            except sqlite3.Error as e:
+                print(f"Erro ao abrir banco SQLite, usando arquivos: {e}")
+                self.database = None
+        if not self.database: self.comments = CommentStore(comments_filepath)
+        self.comments.load()
+        self.send_history = SendHistory(os.path.join(data_dir, "historico_envios.log"))
+        self.send_history.load()
+        self.number_check_cache = NumberCheckCache(os.path.join(data_dir, "verificacao_numeros.log"))
+        self.number_check_cache.load()
+        self._init_campaign_state()
+        self._apply_campaign_config(state)
+        self.interval = (int(state.get("min_interval", 20)), int(state.get("max_interval", 45)))
+
+        self.contact_store = ContactStore()
+        self.list_columns = {}
+        self.message_templates = []
+        self.current_filepath = None
+        self.csv_journal = None
+        self.report_path = report_path
+        self.finished = False
+        self.connectors = {}
+        self.connection_monitors = {}
+        self.connection_status_results = queue.Queue()
+        self._timers = [] # heap de (instante monotonic, id, função, argumentos)
+        self._cancelled = set()
+        self._next_timer_id = 0
+
+    # --- Agendamentos no lugar do after() do Tk ---
+    def after(self, ms, func, *args):
+        self._next_timer_id += 1
+        heapq.heappush(self._timers, (time.monotonic() + ms / 1000, self._next_timer_id, func, args))
+        return self._next_timer_id
+
+    def after_cancel(self, timer_id):
+        self._cancelled.add(timer_id)
+
+    def run(self):
+        """Executa os agendamentos até a campanha terminar ou parar; Ctrl+C equivale ao STOP. Retorna se terminou."""
         try:
-            with open(self.current_filepath, 'r', encoding='utf-8', newline='') as file: lines = list(csv.reader(file))
-            if 0 < (idx := int(contact_number)) < len(lines):
-                row = lines[idx]
-                while len(row) <= 3: row.append('')
-                row[3] = new_status
-                with open(self.current_filepath, 'w', encoding='utf-8', newline='') as file: csv.writer(file).writerows(lines)
-                return True
-            return False
-        except Exception as e: print(f"ERRO ao salvar status no CSV: {e}"); return False
+            while self.auto_send_running and self._timers:
+                when, timer_id, func, args = self._timers[0]
+                if (wait := when - time.monotonic()) > 0: time.sleep(wait); continue
+                heapq.heappop(self._timers)
+                if timer_id in self._cancelled: self._cancelled.discard(timer_id); continue
+                func(*args)
+        except KeyboardInterrupt:
+            print("Campanha interrompida; use --resume para continuar de onde parou.")
+            self._stop_auto_send()
+        return self.finished
+
+    # --- Lista, templates e perfis ---
+    def load_list(self, filepath):
+        """Carrega a lista como o App (com as edições pendentes e o progresso da última campanha): (ok, mensagem)."""
+        self.current_filepath = filepath
+        self.csv_journal = None if self.database else CsvEditJournal(filepath)
+        self.campaign_checkpoint = CampaignCheckpoint(filepath)
+        normalizer, results = PhoneNormalizer(), queue.Queue()
+        loader = ContactListLoader(filepath, results, lambda n, row: normalizer.apply(self._build_contact(n, row)),
+                                   journal=self.csv_journal, database=self.database)
+        loader.run()
+        contacts = []
+        while not results.empty():
+            kind, _, payload, _ = results.get_nowait()
+            if kind == "chunk": contacts.extend(payload[0])
+            elif kind == "error": return False, f"Erro ao ler a lista: {payload}"
+        self.contact_store.load(contacts)
+        self.list_columns = {MessageTemplate.field_key(name): i for i, name in enumerate(loader.header) if name.strip()}
+        self._restore_campaign_progress()
+        invalid = sum(1 for c in contacts if c.phone_issue)
+        return True, f"Lista: {os.path.basename(filepath)}, {len(contacts)} contatos" + (f" ({invalid} telefones inválidos ou duplicados)" if invalid else "")
+
+    def load_templates(self, filepaths):
+        self.message_templates, loaded_paths, failed_files = self._read_templates(filepaths)
+        if failed_files: print(f"Falha ao carregar: {', '.join(failed_files)}")
+        return bool(self.message_templates)
+
+    def connect(self, profile_names, server=None):
+        """Conecta os perfis cujas sessões já estão autenticadas no wppconnect; retorna os conectores conectados."""
+        connectors = []
+        for name in profile_names:
+            connector = self.connectors[name] = self._new_connector(name)
+            if server: connector.base_url = server.rstrip("/")
+            success, message = connector.start_session()
+            if success and not connector.is_connected: connector.check_connection_status()
+            if not connector.is_connected:
+                print(f"Perfil {name}: não conectado ({message})"); continue
+            monitor = self.connection_monitors[name] = ConnectionMonitor(connector, self.connection_status_results)
+            monitor.start()
+            connectors.append(connector)
+        return connectors
+
+    def _poll_connection_status(self):
+        while True:
+            try: profile_name, connected = self.connection_status_results.get_nowait()
+            except queue.Empty: break
+            print(f"Perfil {profile_name}: {'conectado' if connected else 'desconectado'}")
+        self.after(500, self._poll_connection_status)
+
+    # --- Campanha ---
+    def begin(self, connectors, start_n=None, resume=False, restart=False):
+        """Inicia (ou retoma) a campanha; False, com o motivo no console, se não houver o que enviar."""
+        profiles = [c.session_name for c in connectors]
+        state = self.campaign_checkpoint.state()
+        if resume:
+            if not state or state.finished:
+                print("Não há campanha interrompida para esta lista."); return False
+            if not (pending := self._resume_pending(state)):
+                print("Todos os contatos da campanha já foram processados.")
+                self._checkpoint("finish"); return False
+            if uncertain := sum(1 for s in state.contacts.values() if s == CampaignCheckpoint.SENDING):
+                print(f"{uncertain} envio(s) ficaram sem confirmação na interrupção e não serão repetidos (marcados com '? Verificar').")
+            print(f"Retomando a campanha com {len(pending)} contatos restantes")
+            self._checkpoint("resume", profiles)
+        else:
+            if state and not state.finished and state.contacts and not restart:
+                print(f"Há uma campanha interrompida nesta lista ({len(state.contacts)} contatos já processados). "
+                      "Use --resume para continuar de onde parou ou --restart para descartar esse progresso.")
+                return False
+            start_n = start_n or self.contact_store[0].n
+            if (start_index := self.contact_store.index_of(start_n)) == -1:
+                print(f"Contato {start_n} não encontrado na lista."); return False
+            pending = [c.n for c in self.contact_store.contacts[start_index:]]
+            self._checkpoint("begin", start_n, profiles)
+        self._poll_connection_status()
+        self._launch_campaign(connectors, pending)
+        return True
+
+    def _on_campaign_finished(self):
+        self.finished = True
+        print("Todos os contatos foram processados!")
+        if not (content := self._send_report_text()): return
+        path = self.report_path or os.path.join(os.path.dirname(os.path.abspath(self.current_filepath)),
+                                                f"Relatorio_{datetime.now().strftime('%Y%m%d_%H%M')}.txt")
+        try:
+            with open(path, "w", encoding="utf-8") as f: f.write(content)
+            print(f"Relatório salvo em: {path}")
+        except OSError as e: print(f"Erro ao salvar relatório: {e}")
+
+    def _default_interval(self):
+        return self.interval
+
+    def close(self):
+        """Aguarda os envios já disparados, registra seus resultados e grava tudo em disco."""
+        for worker in self.campaign_workers.values(): worker.stop()
+        for worker in self.campaign_workers.values(): worker.join(timeout=60)
+        while True:
+            try: self._on_auto_send_result(self.campaign_results.get_nowait())
+            except queue.Empty: break
+        for monitor in self.connection_monitors.values(): monitor.stop()
+        for connector in self.connectors.values(): connector.close()
+        self._sync_list_file()
+        self.comments.flush()
+        if self.database: self.database.close()
+        if aiohttp: AsyncWhatsAppConnector.shutdown()
+
+def run_campaign_cli(argv):
+    """`python huby.py campaign ...`: envia uma campanha sem interface. Retorna o código de saída."""
+    parser = argparse.ArgumentParser(prog="huby.py campaign", description="Envia uma campanha sem interface, com a mesma lógica e os mesmos arquivos do App.")
+    parser.add_argument("lista", help="lista de contatos (.csv)")
+    parser.add_argument("-t", "--templates", nargs="+", help="arquivos .txt de mensagem (padrão: os últimos carregados no App)")
+    parser.add_argument("-p", "--profiles", nargs="+", help="perfis que enviam, em paralelo se mais de um (padrão: todos os do config.json)")
+    parser.add_argument("--start", type=int, metavar="N", help="N do contato a partir do qual enviar (padrão: o primeiro)")
+    parser.add_argument("--resume", action="store_true", help="continua a campanha interrompida da lista")
+    parser.add_argument("--restart", action="store_true", help="inicia uma nova campanha descartando a interrompida")
+    parser.add_argument("--interval", nargs=2, type=int, metavar=("MIN", "MAX"), help="segundos entre envios (padrão: os do config.json)")
+    parser.add_argument("--report", help="arquivo do relatório (padrão: Relatorio_<data>.txt ao lado da lista)")
+    parser.add_argument("--config", help="config.json a usar; comentários e históricos ficam na mesma pasta (padrão: o do App)")
+    parser.add_argument("--server", help="endereço do wppconnect (padrão: http://localhost:21465)")
+    parser.add_argument("--no-preflight", action="store_true", help="não verifica antes quais números têm WhatsApp")
+    args = parser.parse_args(argv)
+
+    config_filepath = os.path.abspath(args.config or os.path.join(os.path.dirname(os.path.realpath(__file__)), "config.json"))
+    state = {}
+    if os.path.exists(config_filepath):
+        try:
+            with open(config_filepath, "r") as f: state = json.load(f)
+        except (OSError, ValueError) as e: print(f"Erro ao ler {config_filepath}: {e}"); return 2
+    if args.interval and (args.interval[0] <= 0 or args.interval[1] < args.interval[0]):
+        print("Intervalo inválido."); return 2
+    if not os.path.exists(args.lista):
+        print(f"Lista não encontrada: {args.lista}"); return 2
+    try:
+        locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
+    except locale.Error:
+        print("Locale pt_BR.UTF-8 não encontrado.")
+
+    campaign = HeadlessCampaign(os.path.dirname(config_filepath), state, args.report)
+    try:
+        if args.no_preflight: campaign.preflight_check = False
+        if args.interval: campaign.interval = tuple(args.interval)
+        success, message = campaign.load_list(os.path.abspath(args.lista))
+        print(message)
+        if not success or not len(campaign.contact_store): return 2
+        if not campaign.load_templates(args.templates or state.get("last_message_files", [])):
+            print("Nenhum template de mensagem carregado (use --templates)."); return 2
+        if not (connectors := campaign.connect(args.profiles or state.get("profile_names", []), args.server)):
+            print("Nenhum perfil conectado ao WhatsApp."); return 2
+        if not campaign.begin(connectors, args.start, args.resume, args.restart): return 1
+        return 0 if campaign.run() else 1
+    finally:
+        campaign.close()
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["campaign"]: sys.exit(run_campaign_cli(sys.argv[2:]))
     try:
         app = App()
         app.mainloop()
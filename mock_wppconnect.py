@@ -0,0 +1,171 @@
+"""
+Servidor local que imita os endpoints do WPPConnect usados pelo huby.py, para
+testar e medir a aplicação sem uma sessão real do WhatsApp.
+
+    python mock_wppconnect.py --port 21465 --latency 0.3 --jitter 0.2 --error-rate 0.05 --chat-size 200
+
+Com a porta padrão (21465), o huby.py conecta nele como se fosse o servidor real.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# ===================================================================
+# SERVIDOR SIMULADO
+# ===================================================================
+class MockWPPConnect:
+    """
+    Servidor HTTP numa thread própria. `latency` + até `jitter` segundos são
+    esperados antes de cada resposta; `error_rate` das chamadas de envio falham
+    (metade com 500, metade com 429) e `missing_rate` dos números não existem no
+    WhatsApp (sempre os mesmos, sorteados pelo próprio número).
+    """
+    SECRET_KEY = "THISISMYSECURETOKEN"
+    TOKEN = "mock-token"
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 missing_rate=0.0, chat_size=50, connected=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.missing_rate = missing_rate
+        self.chat_size = chat_size
+        self.connected = connected
+        self.stats = {} # endpoint -> chamadas
+        self.sent = [] # (sessão, telefone, mensagem)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def number_exists(self, phone):
+        return random.Random(phone).random() >= self.missing_rate
+
+    def _count(self, endpoint):
+        with self._lock: self.stats[endpoint] = self.stats.get(endpoint, 0) + 1
+
+    def _messages(self, phone, include_me=True):
+        messages = [{"id": f"{phone}_{i}", "body": f"Mensagem {i}", "fromMe": i % 2 == 0,
+                     "timestamp": 1700000000 + i * 60} for i in range(self.chat_size)]
+        return messages if include_me else [m for m in messages if not m["fromMe"]]
+
+    def handle(self, method, path, query, body):
+        """Resposta (status, json) para uma chamada; os endpoints ficam em /api/<sessão>/<endpoint>."""
+        if m := re.fullmatch(r"/api/([^/]+)/([^/]+)/generate-token", path):
+            self._count("generate-token")
+            if m.group(2) != self.SECRET_KEY: return 401, {"message": "Invalid secret key"}
+            return 201, {"status": "success", "session": m.group(1), "token": self.TOKEN}
+        if not (m := re.fullmatch(r"/api/([^/]+)/([^/]+)(?:/([^/]+))?", path)):
+            return 404, {"message": "Not found"}
+        session, endpoint, phone = m.groups()
+        self._count(endpoint)
+
+        if self.latency or self.jitter: time.sleep(self.latency + random.uniform(0, self.jitter))
+        if endpoint == "start-session":
+            return 200, {"status": "CONNECTED" if self.connected else "QRCODE", "session": session}
+        if endpoint == "check-connection-session":
+            return 200, {"status": self.connected, "message": "Connected" if self.connected else "Disconnected"}
+        if endpoint in ("close-session", "logout-session"):
+            return 200, {"status": True, "message": "Session closed"}
+        if endpoint == "check-number-status" and phone:
+            return 200, {"status": "success", "response": {"numberExists": self.number_exists(phone), "id": {"user": phone}}}
+        if endpoint == "send-message":
+            phone = str(body.get("phone", ""))
+            if self.error_rate and random.random() < self.error_rate:
+                return random.choice([(500, {"message": "Internal server error"}), (429, {"message": "Too many requests"})])
+            if not self.number_exists(phone): return 400, {"message": "The number does not exist"}
+            with self._lock: self.sent.append((session, phone, body.get("message", "")))
+            return 201, {"status": "success", "response": [{"id": f"true_{phone}@c.us_{len(self.sent)}"}]}
+        if endpoint == "all-messages-in-chat" and phone:
+            include_me = query.get("includeMe", ["true"])[0] == "true"
+            return 200, {"status": "success", "response": self._messages(phone, include_me)}
+        if endpoint == "get-messages" and phone:
+            count = int(query.get("count", [20])[0])
+            return 200, {"status": "success", "response": self._messages(phone)[-count:]}
+        return 404, {"message": f"Endpoint não simulado: {endpoint}"}
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, como o servidor real
+            disable_nagle_algorithm = True # senão cada resposta espera o ACK atrasado (~40 ms)
+
+            def log_message(self, *args): pass
+
+            def _reply(self, method):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                try: body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                except ValueError: body = {}
+                status, data = mock.handle(method, url.path, parse_qs(url.query), body)
+                payload = json.dumps(data).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True # cliente desistiu (timeout); nada a responder
+
+            def handle(self):
+                # Cliente que fecha a conexão keep-alive no meio da leitura não é erro do mock
+                try: super().handle()
+                except (BrokenPipeError, ConnectionResetError): pass
+
+            def do_GET(self): self._reply("GET")
+            def do_POST(self): self._reply("POST")
+
+        return Handler
+
+# ===================================================================
+# LINHA DE COMANDO
+# ===================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Servidor WPPConnect simulado para testes do Huby.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=21465)
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos de espera por resposta")
+    parser.add_argument("--jitter", type=float, default=0.0, help="espera extra aleatória, em segundos")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração dos envios que falham (500/429)")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="fração dos números sem WhatsApp")
+    parser.add_argument("--chat-size", type=int, default=50, help="mensagens por conversa")
+    args = parser.parse_args()
+
+    mock = MockWPPConnect(args.host, args.port, args.latency, args.jitter, args.error_rate, args.missing_rate, args.chat_size)
+    print(f"WPPConnect simulado em {mock.url} (Ctrl+C para sair)")
+    mock.start()
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt:
+        mock.stop()
+        print(f"Chamadas: {mock.stats}")
+
+if __name__ == "__main__":
+    main()